@@ -1,22 +1,38 @@
 from flask import Flask, jsonify, send_from_directory
 from flask_cors import CORS
 from backend.models.document import db
+from backend.models.search_indexes import create_search_indexes
+from backend.models.sqlite_pragmas import enable_sqlite_pragmas
 from backend.api.documents import documents_bp
 from backend.api.concepts import concepts_bp
-from backend.api.search import search_bp
+from backend.api.search import search_bp, init_search_engine
+from backend.api.json_provider import OrjsonProvider
+from backend.cache import cache
 import os
 
 def create_app():
     app = Flask(__name__)
+    app.json = OrjsonProvider(app)
     
     # Configuration
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
     app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///second_brain.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
+    # Create missing tables on startup; set AUTO_CREATE_TABLES=0 where the schema is managed separately
+    app.config['AUTO_CREATE_TABLES'] = os.environ.get('AUTO_CREATE_TABLES', '1') == '1'
+    
+    # Response cache shared by all workers through Redis; per-process when REDIS_URL is unset
+    if os.environ.get('REDIS_URL'):
+        app.config['CACHE_TYPE'] = 'RedisCache'
+        app.config['CACHE_REDIS_URL'] = os.environ['REDIS_URL']
+    else:
+        app.config['CACHE_TYPE'] = 'SimpleCache'
+    app.config['CACHE_DEFAULT_TIMEOUT'] = 30
     
     # Initialize extensions
     db.init_app(app)
+    cache.init_app(app)
     CORS(app, origins=["http://localhost:3000"], supports_credentials=True, allow_headers=["Content-Type", "Authorization"], methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
     
     # Register blueprints
@@ -24,9 +40,15 @@ def create_app():
     app.register_blueprint(concepts_bp, url_prefix='/api/concepts')
     app.register_blueprint(search_bp, url_prefix='/api/search')
     
-    # Create tables
     with app.app_context():
-        db.create_all()
+        enable_sqlite_pragmas(db.engine)
+        
+        if app.config['AUTO_CREATE_TABLES']:
+            db.create_all()
+        create_search_indexes(db.engine)
+    
+    # Load the search index once per process (or once in total with gunicorn --preload)
+    init_search_engine(app)
     
     @app.route('/')
     def index():
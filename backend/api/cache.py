@@ -0,0 +1,20 @@
+from flask import request
+from backend.cache import cache, data_version
+
+ANALYTICS_TIMEOUT = 30
+
+def analytics_cache_key(*args, **kwargs):
+    """Cache key combining the data version with the request path and query string"""
+    return f'view/{data_version()}/{request.full_path}'
+
+def is_cacheable(response):
+    """Only cache successful responses; error handlers return (body, status) tuples"""
+    return not isinstance(response, tuple) and response.status_code == 200
+
+def cached_analytics(timeout=ANALYTICS_TIMEOUT):
+    """Cache a read-only analytics view until it expires or the data changes"""
+    return cache.cached(
+        timeout=timeout,
+        make_cache_key=analytics_cache_key,
+        response_filter=is_cacheable
+    )
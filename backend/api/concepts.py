@@ -1,46 +1,106 @@
 from flask import Blueprint, request, jsonify, current_app
-from backend.models.document import Concept, ConceptRelation, Document, db
+from backend.models.document import Concept, ConceptRelation, Document, db, document_concepts
+from backend.models.search_indexes import concept_name_filter
 from backend.services.concept_analyzer import ConceptAnalyzer
-from sqlalchemy import func, desc
+from backend.api.jobs import JobRegistry
+from backend.api.pagination import seek_page
+from backend.api.cache import ANALYTICS_TIMEOUT, cached_analytics
+from backend.cache import bump_data_version, cache, data_version
+from sqlalchemy import case, func, desc, literal, select, union_all
+from sqlalchemy.orm import selectinload
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import threading
+import uuid
 
 concepts_bp = Blueprint('concepts', __name__)
 
+MAX_RELATIONS_LIMIT = 1000
+
+# Concept analysis runs one job at a time off the request thread
+_analysis_executor = ThreadPoolExecutor(max_workers=1)
+_analysis_jobs = JobRegistry()
+_analysis_queued = {}  # document id -> id of the job that will analyze it
+_analysis_lock = threading.Lock()
+
+# Shared analyzer instance; it only holds the NLP model and regex patterns
+_analyzer = None
+_analyzer_lock = threading.Lock()
+
+def _get_analyzer():
+    """Get or create the shared concept analyzer"""
+    global _analyzer
+    if _analyzer is None:
+        with _analyzer_lock:
+            if _analyzer is None:
+                _analyzer = ConceptAnalyzer()
+    return _analyzer
+
 @concepts_bp.route('/', methods=['GET'])
 def get_concepts():
     """Get all concepts with optional filtering"""
     try:
-        page = request.args.get('page', 1, type=int)
+        page = request.args.get('page', type=int)
         per_page = request.args.get('per_page', 50, type=int)
+        cursor = request.args.get('cursor')
+        include_total = request.args.get('include_total', 0, type=int)
         category = request.args.get('category')
         search = request.args.get('search')
         sort_by = request.args.get('sort_by', 'frequency')  # frequency, name, created_date
         
-        query = Concept.query
+        # Select plain columns instead of ORM objects
+        query = db.session.query(*Concept.list_columns())
         
         if category:
             query = query.filter(Concept.category == category)
         
         if search:
-            query = query.filter(Concept.name.contains(search.lower()))
+            query = query.filter(concept_name_filter(search))
+        
+        # Page-number requests keep the legacy OFFSET-based behaviour
+        if page and not cursor:
+            if sort_by == 'frequency':
+                query = query.order_by(desc(Concept.frequency), desc(Concept.id))
+            elif sort_by == 'name':
+                query = query.order_by(Concept.name, Concept.id)
+            elif sort_by == 'created_date':
+                query = query.order_by(desc(Concept.created_date), desc(Concept.id))
+            
+            concepts = query.paginate(page=page, per_page=per_page, error_out=False)
+            
+            return jsonify({
+                'concepts': [Concept.row_to_dict(row) for row in concepts.items],
+                'total': concepts.total,
+                'pages': concepts.pages,
+                'current_page': page,
+                'per_page': per_page
+            })
         
         # Apply sorting
-        if sort_by == 'frequency':
-            query = query.order_by(desc(Concept.frequency))
-        elif sort_by == 'name':
-            query = query.order_by(Concept.name)
+        if sort_by == 'name':
+            sort_column, descending = Concept.name, False
         elif sort_by == 'created_date':
-            query = query.order_by(desc(Concept.created_date))
-        
-        concepts = query.paginate(page=page, per_page=per_page, error_out=False)
-        
-        return jsonify({
-            'concepts': [concept.to_dict() for concept in concepts.items],
-            'total': concepts.total,
-            'pages': concepts.pages,
-            'current_page': page,
+            sort_column, descending = Concept.created_date, True
+        else:
+            sort_column, descending = Concept.frequency, True
+        
+        concepts, next_cursor = seek_page(
+            query, sort_column, Concept.id,
+            cursor=cursor, per_page=per_page, descending=descending
+        )
+        
+        response = {
+            'concepts': [Concept.row_to_dict(row) for row in concepts],
+            'next_cursor': next_cursor,
             'per_page': per_page
-        })
+        }
+        if include_total:
+            response['total'] = query.order_by(None).count()
+        
+        return jsonify(response)
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"Get concepts error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
@@ -49,10 +109,15 @@ def get_concepts():
 def get_concept(concept_id):
     """Get a specific concept with its relationships and documents"""
     try:
-        concept = Concept.query.get_or_404(concept_id)
-        
-        # Get related concepts
-        relations = ConceptRelation.query.filter(
+        concept = Concept.query.options(
+            selectinload(Concept.documents)
+        ).get_or_404(concept_id)
+        
+        # Get related concepts, loading both ends of each relation up front
+        relations = ConceptRelation.query.options(
+            selectinload(ConceptRelation.concept1),
+            selectinload(ConceptRelation.concept2)
+        ).filter(
             (ConceptRelation.concept1_id == concept_id) |
             (ConceptRelation.concept2_id == concept_id)
         ).all()
@@ -76,7 +141,7 @@ def get_concept(concept_id):
                 'id': doc.id,
                 'title': doc.title,
                 'summary': doc.summary,
-                'upload_date': doc.upload_date.isoformat() if doc.upload_date else None
+                'upload_date': doc.upload_date
             }
             for doc in concept.documents
         ]
@@ -92,6 +157,7 @@ def get_concept(concept_id):
         return jsonify({'error': 'Internal server error'}), 500
 
 @concepts_bp.route('/categories', methods=['GET'])
+@cached_analytics()
 def get_concept_categories():
     """Get all concept categories with counts"""
     try:
@@ -111,6 +177,32 @@ def get_concept_categories():
         current_app.logger.error(f"Get concept categories error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+def _build_graph(min_strength, category):
+    """Build and serialize the concept graph; returns the body and its ETag"""
+    analyzer = _get_analyzer()
+    graph = analyzer.build_concept_graph(min_strength=min_strength, category=category)
+    
+    body = current_app.json.dumps(graph).encode('utf-8')
+    return body, hashlib.md5(body).hexdigest()
+
+def _cached_graph(min_strength, category):
+    """Get the serialized concept graph, built at most once per data version and timeout"""
+    try:
+        cache_key = f'concept_graph/{data_version()}/{min_strength}/{category or ""}'
+        cached = cache.get(cache_key)
+    except Exception as e:
+        # A cache outage must not fail the request; build the graph uncached
+        current_app.logger.error(f"Concept graph cache error: {str(e)}")
+        return _build_graph(min_strength, category)
+    
+    if cached is None:
+        cached = _build_graph(min_strength, category)
+        try:
+            cache.set(cache_key, cached, timeout=ANALYTICS_TIMEOUT)
+        except Exception as e:
+            current_app.logger.error(f"Concept graph cache error: {str(e)}")
+    return cached
+
 @concepts_bp.route('/graph', methods=['GET'])
 def get_concept_graph():
     """Get concept relationship graph"""
@@ -118,53 +210,140 @@ def get_concept_graph():
         min_strength = request.args.get('min_strength', 0.3, type=float)
         category = request.args.get('category')
         
-        analyzer = ConceptAnalyzer()
-        graph = analyzer.build_concept_graph(min_strength=min_strength)
+        body, etag = _cached_graph(min_strength, category)
         
-        # Filter by category if specified
-        if category:
-            # Filter nodes
-            category_nodes = [node for node in graph['nodes'] if node['category'] == category]
-            category_node_ids = {node['id'] for node in category_nodes}
-            
-            # Filter edges to only include connections between category nodes
-            category_edges = [
-                edge for edge in graph['edges']
-                if edge['source'] in category_node_ids and edge['target'] in category_node_ids
-            ]
-            
-            graph = {
-                'nodes': category_nodes,
-                'edges': category_edges
-            }
-        
-        return jsonify(graph)
+        if etag in request.if_none_match:
+            response = current_app.response_class(status=304)
+        else:
+            response = current_app.response_class(body, mimetype='application/json')
+        response.set_etag(etag)
+        return response
         
     except Exception as e:
         current_app.logger.error(f"Get concept graph error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+def _do_analysis(app, document_ids):
+    """Run concept analysis for documents and serialize the extracted concepts"""
+    try:
+        with app.app_context():
+            results = _get_analyzer().process_documents_batch(document_ids)
+            bump_data_version()
+            return {
+                document_id: [concept.to_dict() for concept in concepts]
+                for document_id, concepts in results.items()
+            }
+    finally:
+        with _analysis_lock:
+            for document_id in document_ids:
+                _analysis_queued.pop(document_id, None)
+
+def _queue_analysis(document_ids):
+    """
+    Queue concept analysis for documents off the request thread
+    
+    Documents that already wait in or run in another job are left to that
+    job. Returns the new job id (None when every document was already
+    queued) and a dict mapping the already queued documents to their job.
+    """
+    with _analysis_lock:
+        already_queued = {
+            document_id: _analysis_queued[document_id]
+            for document_id in document_ids if document_id in _analysis_queued
+        }
+        new_ids = [document_id for document_id in document_ids if document_id not in already_queued]
+        if not new_ids:
+            return None, already_queued
+        
+        job_id = uuid.uuid4().hex
+        for document_id in new_ids:
+            _analysis_queued[document_id] = job_id
+        _analysis_jobs.add(job_id, _analysis_executor.submit(
+            _do_analysis, current_app._get_current_object(), new_ids
+        ))
+    return job_id, already_queued
+
 @concepts_bp.route('/analyze/<int:document_id>', methods=['POST'])
 def analyze_document_concepts(document_id):
-    """Analyze and extract concepts from a document"""
+    """Queue concept analysis for a document"""
     try:
         document = Document.query.get_or_404(document_id)
         
         if document.processing_status != 'completed':
             return jsonify({'error': 'Document not yet processed'}), 400
         
-        analyzer = ConceptAnalyzer()
-        concepts = analyzer.process_document_concepts(document_id)
+        job_id, already_queued = _queue_analysis([document_id])
         
         return jsonify({
-            'message': f'Extracted {len(concepts)} concepts from document',
-            'concepts': [concept.to_dict() for concept in concepts]
-        })
+            'message': 'Concept analysis queued',
+            'job_id': job_id or already_queued[document_id],
+            'status': 'queued'
+        }), 202
         
     except Exception as e:
         current_app.logger.error(f"Analyze document concepts error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@concepts_bp.route('/analyze/batch', methods=['POST'])
+def analyze_documents_concepts_batch():
+    """Queue concept analysis for several documents in one job"""
+    try:
+        data = request.get_json()
+        
+        if not data or not data.get('document_ids'):
+            return jsonify({'error': 'document_ids is required'}), 400
+        
+        document_ids = data['document_ids']
+        
+        # Only fully processed documents are analyzed
+        completed_ids = [
+            document_id for (document_id,) in db.session.query(Document.id).filter(
+                Document.id.in_(document_ids),
+                Document.processing_status == 'completed'
+            )
+        ]
+        if not completed_ids:
+            return jsonify({'error': 'No processed documents to analyze'}), 400
+        
+        job_id, already_queued = _queue_analysis(completed_ids)
+        
+        return jsonify({
+            'message': 'Concept analysis queued',
+            'job_id': job_id,
+            'status': 'queued',
+            'already_queued': {str(document_id): queued_job for document_id, queued_job in already_queued.items()},
+            'skipped_document_ids': [doc_id for doc_id in document_ids if doc_id not in completed_ids]
+        }), 202
+        
+    except Exception as e:
+        current_app.logger.error(f"Batch analyze document concepts error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@concepts_bp.route('/analyze/jobs/<job_id>', methods=['GET'])
+def get_analysis_status(job_id):
+    """Get the status of a background concept analysis"""
+    future = _analysis_jobs.get(job_id)
+    if future is None:
+        return jsonify({'error': 'Unknown analysis job'}), 404
+    
+    if not future.done():
+        status = 'running' if future.running() else 'queued'
+        return jsonify({'job_id': job_id, 'status': status})
+    
+    error = future.exception()
+    if error is not None:
+        current_app.logger.error(f"Analyze document concepts error: {str(error)}")
+        return jsonify({'job_id': job_id, 'status': 'failed', 'error': 'Concept analysis failed'})
+    
+    return jsonify({
+        'job_id': job_id,
+        'status': 'done',
+        'results': [
+            {'document_id': document_id, 'concepts': concepts}
+            for document_id, concepts in future.result().items()
+        ]
+    })
+
 @concepts_bp.route('/relations', methods=['GET'])
 def get_concept_relations():
     """Get concept relationships"""
@@ -172,14 +351,24 @@ def get_concept_relations():
         concept_id = request.args.get('concept_id', type=int)
         relation_type = request.args.get('relation_type')
         min_strength = request.args.get('min_strength', 0.0, type=float)
+        limit = min(request.args.get('limit', 100, type=int), MAX_RELATIONS_LIMIT)
+        cursor = request.args.get('cursor')
+        
+        if limit < 1:
+            return jsonify({'error': f'limit must be between 1 and {MAX_RELATIONS_LIMIT}'}), 400
         
-        query = ConceptRelation.query
+        query = ConceptRelation.query.options(
+            selectinload(ConceptRelation.concept1),
+            selectinload(ConceptRelation.concept2)
+        )
         
         if concept_id:
-            query = query.filter(
-                (ConceptRelation.concept1_id == concept_id) |
-                (ConceptRelation.concept2_id == concept_id)
+            # One index lookup per side instead of an OR the planner may turn into a scan
+            relation_ids = union_all(
+                select(ConceptRelation.id).where(ConceptRelation.concept1_id == concept_id),
+                select(ConceptRelation.id).where(ConceptRelation.concept2_id == concept_id)
             )
+            query = query.filter(ConceptRelation.id.in_(relation_ids))
         
         if relation_type:
             query = query.filter(ConceptRelation.relation_type == relation_type)
@@ -187,12 +376,18 @@ def get_concept_relations():
         if min_strength > 0:
             query = query.filter(ConceptRelation.strength >= min_strength)
         
-        relations = query.order_by(desc(ConceptRelation.strength)).all()
+        relations, next_cursor = seek_page(
+            query, ConceptRelation.strength, ConceptRelation.id,
+            cursor=cursor, per_page=limit
+        )
         
         return jsonify({
-            'relations': [relation.to_dict() for relation in relations]
+            'relations': [relation.to_dict() for relation in relations],
+            'next_cursor': next_cursor
         })
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"Get concept relations error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
@@ -203,7 +398,7 @@ def get_similar_documents(document_id):
     try:
         limit = request.args.get('limit', 5, type=int)
         
-        analyzer = ConceptAnalyzer()
+        analyzer = _get_analyzer()
         similar_docs = analyzer.suggest_related_documents(document_id, limit=limit)
         
         return jsonify({
@@ -215,6 +410,7 @@ def get_similar_documents(document_id):
         return jsonify({'error': 'Internal server error'}), 500
 
 @concepts_bp.route('/stats', methods=['GET'])
+@cached_analytics()
 def get_concept_stats():
     """Get concept statistics"""
     try:
@@ -271,26 +467,57 @@ def merge_concepts():
         # Merge frequency
         primary_concept.frequency += secondary_concept.frequency
         
-        # Transfer document relationships
-        for doc in secondary_concept.documents:
-            if doc not in primary_concept.documents:
-                primary_concept.documents.append(doc)
-        
-        # Transfer concept relationships
-        relations_to_update = ConceptRelation.query.filter(
+        # Transfer document relationships the primary concept doesn't already have
+        primary_documents = select(document_concepts.c.document_id).where(
+            document_concepts.c.concept_id == primary_id
+        )
+        db.session.execute(document_concepts.insert().from_select(
+            ['document_id', 'concept_id', 'relevance_score', 'context'],
+            select(
+                document_concepts.c.document_id,
+                literal(primary_id),
+                document_concepts.c.relevance_score,
+                document_concepts.c.context
+            ).where(
+                document_concepts.c.concept_id == secondary_id,
+                document_concepts.c.document_id.not_in(primary_documents)
+            )
+        ))
+        db.session.execute(document_concepts.delete().where(
+            document_concepts.c.concept_id == secondary_id
+        ))
+        
+        # Drop secondary relations that would become self-loops or duplicate a
+        # relation the primary concept already has
+        primary_partners = union_all(
+            select(ConceptRelation.concept2_id).where(ConceptRelation.concept1_id == primary_id),
+            select(ConceptRelation.concept1_id).where(ConceptRelation.concept2_id == primary_id)
+        )
+        db.session.query(ConceptRelation).filter(
+            ((ConceptRelation.concept1_id == secondary_id) &
+             ((ConceptRelation.concept2_id == primary_id) | ConceptRelation.concept2_id.in_(primary_partners))) |
+            ((ConceptRelation.concept2_id == secondary_id) &
+             ((ConceptRelation.concept1_id == primary_id) | ConceptRelation.concept1_id.in_(primary_partners)))
+        ).delete(synchronize_session=False)
+        
+        # Transfer the remaining relationships in one UPDATE, keeping the lower id first
+        partner_id = case(
+            (ConceptRelation.concept1_id == secondary_id, ConceptRelation.concept2_id),
+            else_=ConceptRelation.concept1_id
+        )
+        db.session.query(ConceptRelation).filter(
             (ConceptRelation.concept1_id == secondary_id) |
             (ConceptRelation.concept2_id == secondary_id)
-        ).all()
-        
-        for relation in relations_to_update:
-            if relation.concept1_id == secondary_id:
-                relation.concept1_id = primary_id
-            else:
-                relation.concept2_id = primary_id
-        
-        # Delete secondary concept
-        db.session.delete(secondary_concept)
+        ).update({
+            ConceptRelation.concept1_id: case((partner_id < primary_id, partner_id), else_=primary_id),
+            ConceptRelation.concept2_id: case((partner_id < primary_id, primary_id), else_=partner_id)
+        }, synchronize_session=False)
+        
+        # Delete secondary concept; its document links are already gone, so skip
+        # the ORM delete, which would load the documents collection to unlink it
+        db.session.query(Concept).filter(Concept.id == secondary_id).delete()
         db.session.commit()
+        bump_data_version()
         
         return jsonify({
             'message': 'Concepts merged successfully',
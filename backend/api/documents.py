@@ -2,7 +2,10 @@ from flask import Blueprint, request, jsonify, current_app
 from werkzeug.exceptions import RequestEntityTooLarge
 from backend.models.document import Document, db
 from backend.services.document_processor import DocumentProcessor
-import os
+from backend.api.pagination import seek_page
+from backend.api.cache import cached_analytics
+from backend.cache import bump_data_version
+from pathlib import Path
 
 documents_bp = Blueprint('documents', __name__)
 
@@ -21,6 +24,7 @@ def upload_document():
         
         # Process the document
         document = processor.process_document(file)
+        bump_data_version()
         
         return jsonify({
             'message': 'Document uploaded and processed successfully',
@@ -39,30 +43,52 @@ def upload_document():
 def get_documents():
     """Get all documents with optional filtering"""
     try:
-        page = request.args.get('page', 1, type=int)
+        page = request.args.get('page', type=int)
         per_page = request.args.get('per_page', 20, type=int)
+        cursor = request.args.get('cursor')
+        include_total = request.args.get('include_total', 0, type=int)
         status = request.args.get('status')
         file_type = request.args.get('file_type')
         
-        query = Document.query
+        # Select plain columns instead of ORM objects, leaving out the full text content
+        query = db.session.query(*Document.list_columns())
         
         if status:
             query = query.filter(Document.processing_status == status)
         if file_type:
             query = query.filter(Document.file_type.contains(file_type))
         
-        documents = query.order_by(Document.upload_date.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
+        # Page-number requests keep the legacy OFFSET-based behaviour
+        if page and not cursor:
+            documents = query.order_by(Document.upload_date.desc(), Document.id.desc()).paginate(
+                page=page, per_page=per_page, error_out=False
+            )
+            
+            return jsonify({
+                'documents': [Document.row_to_dict(row) for row in documents.items],
+                'total': documents.total,
+                'pages': documents.pages,
+                'current_page': page,
+                'per_page': per_page
+            })
+        
+        documents, next_cursor = seek_page(
+            query, Document.upload_date, Document.id,
+            cursor=cursor, per_page=per_page
         )
         
-        return jsonify({
-            'documents': [doc.to_dict() for doc in documents.items],
-            'total': documents.total,
-            'pages': documents.pages,
-            'current_page': page,
+        response = {
+            'documents': [Document.row_to_dict(row) for row in documents],
+            'next_cursor': next_cursor,
             'per_page': per_page
-        })
+        }
+        if include_total:
+            response['total'] = query.order_by(None).count()
         
+        return jsonify(response)
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"Get documents error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
@@ -98,16 +124,18 @@ def delete_document(document_id):
     try:
         document = Document.query.get_or_404(document_id)
         
-        # Delete associated files
-        upload_path = os.path.join('uploads', document.filename)
-        processed_path = os.path.join('processed_docs', f"{document.id}_{document.filename}.txt")
-        
-        for path in [upload_path, processed_path]:
-            if os.path.exists(path):
-                os.remove(path)
+        # Associated files are only removed once the database delete has committed
+        file_paths = [
+            Path('uploads') / document.filename,
+            Path('processed_docs') / f"{document.id}_{document.filename}.txt"
+        ]
         
         db.session.delete(document)
         db.session.commit()
+        bump_data_version()
+        
+        for path in file_paths:
+            path.unlink(missing_ok=True)
         
         return jsonify({'message': 'Document deleted successfully'})
         
@@ -117,15 +145,18 @@ def delete_document(document_id):
         return jsonify({'error': 'Internal server error'}), 500
 
 @documents_bp.route('/stats', methods=['GET'])
+@cached_analytics()
 def get_document_stats():
     """Get document statistics"""
     try:
-        total_docs = Document.query.count()
-        completed_docs = Document.query.filter(Document.processing_status == 'completed').count()
-        failed_docs = Document.query.filter(Document.processing_status == 'failed').count()
-        processing_docs = Document.query.filter(Document.processing_status == 'processing').count()
-        
-        total_words = db.session.query(db.func.sum(Document.word_count)).scalar() or 0
+        # Count every status and sum words in a single table scan
+        total_docs, completed_docs, failed_docs, processing_docs, total_words = db.session.query(
+            db.func.count(Document.id),
+            db.func.sum(db.case((Document.processing_status == 'completed', 1), else_=0)),
+            db.func.sum(db.case((Document.processing_status == 'failed', 1), else_=0)),
+            db.func.sum(db.case((Document.processing_status == 'processing', 1), else_=0)),
+            db.func.coalesce(db.func.sum(Document.word_count), 0)
+        ).one()
         
         file_types = db.session.query(
             Document.file_type, 
@@ -134,9 +165,9 @@ def get_document_stats():
         
         return jsonify({
             'total_documents': total_docs,
-            'completed_documents': completed_docs,
-            'failed_documents': failed_docs,
-            'processing_documents': processing_docs,
+            'completed_documents': completed_docs or 0,
+            'failed_documents': failed_docs or 0,
+            'processing_documents': processing_docs or 0,
             'total_words': total_words,
             'file_types': [{'type': ft[0], 'count': ft[1]} for ft in file_types]
         })
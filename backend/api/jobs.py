@@ -0,0 +1,45 @@
+import threading
+import time
+
+# Finished jobs can be polled for this many seconds before they are dropped
+JOB_RESULT_TTL = 10 * 60
+
+class JobRegistry:
+    """
+    Background jobs of this process by job id
+
+    A finished job is evicted JOB_RESULT_TTL seconds after it completes, so
+    results do not pile up in memory. Jobs live in the process that started
+    them; another worker process does not know their ids.
+    """
+
+    def __init__(self, ttl=JOB_RESULT_TTL):
+        self.ttl = ttl
+        self._jobs = {}
+        self._finished_at = {}
+        self._lock = threading.Lock()
+
+    def add(self, job_id, future):
+        """Register the future of a submitted job"""
+        with self._lock:
+            self._evict_expired()
+            self._jobs[job_id] = future
+        # Runs right away when the job has already finished
+        future.add_done_callback(lambda _: self._mark_finished(job_id))
+
+    def get(self, job_id):
+        """Get the future of a job; None when unknown or expired"""
+        with self._lock:
+            self._evict_expired()
+            return self._jobs.get(job_id)
+
+    def _mark_finished(self, job_id):
+        with self._lock:
+            self._finished_at[job_id] = time.monotonic()
+
+    def _evict_expired(self):
+        cutoff = time.monotonic() - self.ttl
+        expired = [job_id for job_id, finished_at in self._finished_at.items() if finished_at < cutoff]
+        for job_id in expired:
+            del self._finished_at[job_id]
+            self._jobs.pop(job_id, None)
@@ -0,0 +1,70 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import DateTime, tuple_
+
+def encode_cursor(sort_name, values):
+    """Encode the sort key of the last row on a page, and the column it sorts by, into an opaque cursor token"""
+    payload = [sort_name] + [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+
+def decode_cursor(token, sort_name):
+    """Decode a cursor token made for the sort_name column back into its list of sort key values"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    # A cursor from a differently sorted listing would compare unrelated values
+    if not isinstance(payload, list) or len(payload) != 3 or payload[0] != sort_name:
+        raise ValueError('Invalid cursor')
+    return payload[1:]
+
+def _cursor_value(column, value):
+    """Convert a sort value from a cursor to the column's type, raising ValueError when it does not fit"""
+    if value is None:
+        return None
+    if isinstance(column.type, DateTime):
+        try:
+            return datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise ValueError('Invalid cursor')
+    python_type = column.type.python_type
+    accepted = (int, float) if python_type is float else python_type
+    if isinstance(value, bool) or not isinstance(value, accepted):
+        raise ValueError('Invalid cursor')
+    return value
+
+def seek_page(query, sort_column, id_column, cursor=None, per_page=20, descending=True):
+    """
+    Fetch one page of a query using keyset (seek) pagination
+
+    Rows are ordered by (sort_column, id_column) and the page starts right
+    after the row identified by `cursor`, so the database never has to scan
+    and discard the rows of earlier pages the way LIMIT/OFFSET does.
+
+    Returns a tuple of (rows, next_cursor); next_cursor is None on the last page.
+    """
+    key = tuple_(sort_column, id_column)
+
+    if cursor:
+        last_sort_value, last_id = decode_cursor(cursor, sort_column.key)
+        last_sort_value = _cursor_value(sort_column, last_sort_value)
+        last_id = _cursor_value(id_column, last_id)
+        bound = tuple_(last_sort_value, last_id)
+        query = query.filter(key < bound if descending else key > bound)
+
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+
+    # Fetch one extra row to find out whether another page follows
+    rows = query.limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor(sort_column.key, (getattr(last, sort_column.key), getattr(last, id_column.key)))
+
+    return rows, next_cursor
@@ -1,63 +1,197 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
+from backend.models.document import Document
 from backend.services.search_engine import SearchEngine
-from datetime import datetime
+from backend.api.cache import cached_analytics
+from backend.cache import bump_data_version
+from backend.api.jobs import JobRegistry
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 import json
+import numpy as np
+import uuid
 
 search_bp = Blueprint('search', __name__)
 
-# Global search engine instance
-search_engine = None
+# Index rebuilds run one at a time off the request thread
+_reindex_executor = ThreadPoolExecutor(max_workers=1)
+_reindex_jobs = JobRegistry()
+
+def init_search_engine(app):
+    """Build the search engine once at startup and attach it to the app"""
+    with app.app_context():
+        app.extensions['search_engine'] = SearchEngine()
 
 def get_search_engine():
-    """Get or create search engine instance"""
-    global search_engine
-    if search_engine is None:
-        search_engine = SearchEngine()
-    return search_engine
+    """Get the search engine built by init_search_engine()"""
+    return current_app.extensions['search_engine']
+
+def _do_reindex(app):
+    """Build a fresh search engine and swap it in once it is ready"""
+    with app.app_context():
+        # Replacing the dict entry is atomic; requests keep using the old engine until then
+        app.extensions['search_engine'] = SearchEngine()
+        bump_data_version()
+
+SEARCH_TYPES = ('keyword', 'semantic', 'concept', 'hybrid')
+MAX_SEARCH_LIMIT = 500
+# Reference documents per batch similarity request; they are embedded in one call
+MAX_BATCH_DOCUMENTS = 100
+
+class InvalidSearchArgs(ValueError):
+    """Malformed search arguments; the message is safe to return to the client"""
+
+def _parse_date(value, name):
+    """Parse an ISO 8601 date, raising InvalidSearchArgs with a client-facing message"""
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise InvalidSearchArgs(f'Invalid {name}: expected an ISO 8601 date')
+
+def _parse_date_arg(name):
+    """Parse an ISO 8601 date argument from the query string"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    return _parse_date(value, name)
+
+def _parse_date_filters(filters):
+    """Return a copy of JSON body filters with the date range parsed into datetimes"""
+    date_range = filters.get('date_range')
+    if not date_range:
+        return filters
+    if not isinstance(date_range, dict):
+        raise InvalidSearchArgs('Invalid date_range: expected an object with start and/or end')
+    
+    parsed = {
+        key: _parse_date(date_range[key], f'date_range.{key}')
+        for key in ('start', 'end') if date_range.get(key)
+    }
+    return {**filters, 'date_range': parsed}
+
+def _validate_limit(limit):
+    """Check a result limit given by the client"""
+    if not isinstance(limit, int) or isinstance(limit, bool) or not 1 <= limit <= MAX_SEARCH_LIMIT:
+        raise InvalidSearchArgs(f'Invalid limit: expected an integer between 1 and {MAX_SEARCH_LIMIT}')
+
+def _validate_search_options(search_type, limit):
+    """Check the search type and limit shared by the search endpoints"""
+    if search_type not in SEARCH_TYPES:
+        raise InvalidSearchArgs(f"Invalid search type: expected one of {', '.join(SEARCH_TYPES)}")
+    _validate_limit(limit)
+
+def _validate_document_ids(document_ids):
+    """Check the list of reference document IDs of a batch request"""
+    if (not isinstance(document_ids, list) or not 1 <= len(document_ids) <= MAX_BATCH_DOCUMENTS
+            or not all(isinstance(doc_id, int) and not isinstance(doc_id, bool) for doc_id in document_ids)):
+        raise InvalidSearchArgs(f'Invalid document_ids: expected a list of 1 to {MAX_BATCH_DOCUMENTS} integer IDs')
+
+def _parse_search_args():
+    """
+    Parse and validate the query, search type, limit and filters from the request arguments
+    
+    Raises InvalidSearchArgs for malformed arguments so callers can answer with a 400.
+    """
+    query = request.args.get('q', '').strip()
+    search_type = request.args.get('type', 'hybrid')  # keyword, semantic, concept, hybrid
+    limit = request.args.get('limit', 20, type=int)
+    _validate_search_options(search_type, limit)
+    
+    # Parse filters
+    filters = {}
+    
+    # File type filter
+    file_type = request.args.get('file_type')
+    if file_type:
+        filters['file_type'] = file_type
+    
+    # Date range filter
+    start_date = _parse_date_arg('start_date')
+    end_date = _parse_date_arg('end_date')
+    if start_date or end_date:
+        date_range = {}
+        if start_date:
+            date_range['start'] = start_date
+        if end_date:
+            date_range['end'] = end_date
+        filters['date_range'] = date_range
+    
+    # Concept filter
+    concepts = request.args.get('concepts')
+    if concepts:
+        try:
+            concept_ids = [int(c) for c in concepts.split(',')]
+            filters['concepts'] = concept_ids
+        except ValueError:
+            pass
+    
+    # Word count filters
+    min_words = request.args.get('min_words', type=int)
+    max_words = request.args.get('max_words', type=int)
+    if min_words:
+        filters['min_word_count'] = min_words
+    if max_words:
+        filters['max_word_count'] = max_words
+    
+    return query, search_type, limit, filters
+
+def _format_result(result):
+    """Format a search engine result for the API response"""
+    doc = result['document']
+    formatted_result = {
+        'document': {
+            'id': doc.id,
+            'title': doc.title,
+            'summary': doc.summary,
+            'filename': doc.original_filename,
+            'file_type': doc.file_type,
+            'word_count': doc.word_count,
+            'upload_date': doc.upload_date,
+            'processed_date': doc.processed_date
+        },
+        'score': result['score'],
+        'search_type': result['search_type'],
+        'highlights': result.get('highlights', [])
+    }
+    
+    # Add search method info for hybrid searches
+    if 'search_methods' in result:
+        formatted_result['search_methods'] = result['search_methods']
+    
+    # Add concept match info
+    if 'matched_concepts' in result:
+        formatted_result['matched_concepts'] = result['matched_concepts']
+    
+    return formatted_result
+
+def _similarity_query(document):
+    """Build the query used to find documents similar to `document`"""
+    # Use document title and summary as query
+    query = f"{document.title} {document.summary}".strip()
+    if not query:
+        query = document.content[:200]  # Use first 200 chars of content
+    return query
+
+def _format_similar_result(result):
+    """Format a search engine result for the similar documents responses"""
+    doc = result['document']
+    return {
+        'document': {
+            'id': doc.id,
+            'title': doc.title,
+            'summary': doc.summary,
+            'filename': doc.original_filename,
+            'word_count': doc.word_count,
+            'upload_date': doc.upload_date
+        },
+        'similarity_score': result['score']
+    }
 
 @search_bp.route('/', methods=['GET'])
+@cached_analytics()
 def search_documents():
     """Search documents with various options"""
     try:
-        query = request.args.get('q', '').strip()
-        search_type = request.args.get('type', 'hybrid')  # keyword, semantic, concept, hybrid
-        limit = request.args.get('limit', 20, type=int)
-        
-        # Parse filters
-        filters = {}
-        
-        # File type filter
-        file_type = request.args.get('file_type')
-        if file_type:
-            filters['file_type'] = file_type
-        
-        # Date range filter
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
-        if start_date or end_date:
-            date_range = {}
-            if start_date:
-                date_range['start'] = datetime.fromisoformat(start_date)
-            if end_date:
-                date_range['end'] = datetime.fromisoformat(end_date)
-            filters['date_range'] = date_range
-        
-        # Concept filter
-        concepts = request.args.get('concepts')
-        if concepts:
-            try:
-                concept_ids = [int(c) for c in concepts.split(',')]
-                filters['concepts'] = concept_ids
-            except ValueError:
-                pass
-        
-        # Word count filters
-        min_words = request.args.get('min_words', type=int)
-        max_words = request.args.get('max_words', type=int)
-        if min_words:
-            filters['min_word_count'] = min_words
-        if max_words:
-            filters['max_word_count'] = max_words
+        query, search_type, limit, filters = _parse_search_args()
         
         if not query:
             return jsonify({'error': 'Query parameter "q" is required'}), 400
@@ -72,34 +206,7 @@ def search_documents():
         )
         
         # Format results
-        formatted_results = []
-        for result in results:
-            doc = result['document']
-            formatted_result = {
-                'document': {
-                    'id': doc.id,
-                    'title': doc.title,
-                    'summary': doc.summary,
-                    'filename': doc.original_filename,
-                    'file_type': doc.file_type,
-                    'word_count': doc.word_count,
-                    'upload_date': doc.upload_date.isoformat() if doc.upload_date else None,
-                    'processed_date': doc.processed_date.isoformat() if doc.processed_date else None
-                },
-                'score': result['score'],
-                'search_type': result['search_type'],
-                'highlights': result.get('highlights', [])
-            }
-            
-            # Add search method info for hybrid searches
-            if 'search_methods' in result:
-                formatted_result['search_methods'] = result['search_methods']
-            
-            # Add concept match info
-            if 'matched_concepts' in result:
-                formatted_result['matched_concepts'] = result['matched_concepts']
-            
-            formatted_results.append(formatted_result)
+        formatted_results = [_format_result(result) for result in results]
         
         return jsonify({
             'query': query,
@@ -109,10 +216,43 @@ def search_documents():
             'filters_applied': filters
         })
         
+    except InvalidSearchArgs as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"Search error: {str(e)}")
         return jsonify({'error': 'Search failed'}), 500
 
+@search_bp.route('/stream', methods=['GET'])
+def stream_search_documents():
+    """Search documents and stream the results as newline-delimited JSON"""
+    try:
+        query, search_type, limit, filters = _parse_search_args()
+        
+        if not query:
+            return jsonify({'error': 'Query parameter "q" is required'}), 400
+        
+        engine = get_search_engine()
+        results = engine.search_documents(
+            query=query,
+            search_type=search_type,
+            filters=filters,
+            limit=limit
+        )
+        
+        # Serialize one result per line so the client can start consuming
+        # before the whole result set has been formatted
+        def generate():
+            for result in results:
+                yield current_app.json.dumps(_format_result(result)) + '\n'
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        
+    except InvalidSearchArgs as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Stream search error: {str(e)}")
+        return jsonify({'error': 'Search failed'}), 500
+
 @search_bp.route('/suggestions', methods=['GET'])
 def get_search_suggestions():
     """Get search query suggestions"""
@@ -133,6 +273,7 @@ def get_search_suggestions():
         return jsonify({'error': 'Failed to get suggestions'}), 500
 
 @search_bp.route('/analytics', methods=['GET'])
+@cached_analytics()
 def get_search_analytics():
     """Get search analytics and statistics"""
     try:
@@ -147,22 +288,45 @@ def get_search_analytics():
 
 @search_bp.route('/reindex', methods=['POST'])
 def reindex_documents():
-    """Rebuild search indexes"""
+    """Rebuild search indexes in the background"""
     try:
-        global search_engine
-        search_engine = SearchEngine()  # Rebuild indexes
-        
-        analytics = search_engine.get_search_analytics()
+        job_id = uuid.uuid4().hex
+        _reindex_jobs.add(job_id, _reindex_executor.submit(
+            _do_reindex, current_app._get_current_object()
+        ))
         
         return jsonify({
-            'message': 'Search indexes rebuilt successfully',
-            'analytics': analytics
-        })
+            'message': 'Search index rebuild queued',
+            'job_id': job_id,
+            'status': 'queued'
+        }), 202
         
     except Exception as e:
         current_app.logger.error(f"Reindex error: {str(e)}")
         return jsonify({'error': 'Failed to rebuild indexes'}), 500
 
+@search_bp.route('/reindex/<job_id>', methods=['GET'])
+def get_reindex_status(job_id):
+    """Get the status of a background index rebuild"""
+    future = _reindex_jobs.get(job_id)
+    if future is None:
+        return jsonify({'error': 'Unknown reindex job'}), 404
+    
+    if not future.done():
+        status = 'running' if future.running() else 'queued'
+        return jsonify({'job_id': job_id, 'status': status})
+    
+    error = future.exception()
+    if error is not None:
+        current_app.logger.error(f"Reindex error: {str(error)}")
+        return jsonify({'job_id': job_id, 'status': 'failed', 'error': 'Failed to rebuild indexes'})
+    
+    return jsonify({
+        'job_id': job_id,
+        'status': 'done',
+        'analytics': get_search_engine().get_search_analytics()
+    })
+
 @search_bp.route('/similar', methods=['GET'])
 def find_similar_documents():
     """Find documents similar to a given document"""
@@ -174,16 +338,12 @@ def find_similar_documents():
             return jsonify({'error': 'document_id parameter is required'}), 400
         
         # Get the document
-        from backend.models.document import Document
         document = Document.query.get_or_404(document_id)
         
         if not document.content:
             return jsonify({'error': 'Document has no content for similarity search'}), 400
         
-        # Use document title and summary as query
-        query = f"{document.title} {document.summary}".strip()
-        if not query:
-            query = document.content[:200]  # Use first 200 chars of content
+        query = _similarity_query(document)
         
         engine = get_search_engine()
         results = engine.search_documents(
@@ -194,20 +354,11 @@ def find_similar_documents():
         )
         
         # Remove the original document from results
-        similar_docs = []
-        for result in results:
-            if result['document'].id != document_id:
-                similar_docs.append({
-                    'document': {
-                        'id': result['document'].id,
-                        'title': result['document'].title,
-                        'summary': result['document'].summary,
-                        'filename': result['document'].original_filename,
-                        'word_count': result['document'].word_count,
-                        'upload_date': result['document'].upload_date.isoformat() if result['document'].upload_date else None
-                    },
-                    'similarity_score': result['score']
-                })
+        similar_docs = [
+            _format_similar_result(result)
+            for result in results
+            if result['document'].id != document_id
+        ]
         
         return jsonify({
             'document_id': document_id,
@@ -218,6 +369,51 @@ def find_similar_documents():
         current_app.logger.error(f"Similar documents error: {str(e)}")
         return jsonify({'error': 'Failed to find similar documents'}), 500
 
+@search_bp.route('/similar/batch', methods=['POST'])
+def find_similar_documents_batch():
+    """Find documents similar to each of several documents in one request"""
+    try:
+        data = request.get_json()
+        
+        if not data or not data.get('document_ids'):
+            return jsonify({'error': 'document_ids is required'}), 400
+        
+        document_ids = data['document_ids']
+        limit = data.get('limit', 5)
+        _validate_document_ids(document_ids)
+        _validate_limit(limit)
+        
+        documents = Document.query.filter(Document.id.in_(document_ids)).all()
+        
+        # Only documents with content can be used as a similarity query
+        sources = [doc for doc in documents if doc.content]
+        source_ids = {doc.id for doc in sources}
+        
+        engine = get_search_engine()
+        batch_results = engine.search_documents_batch(
+            queries=[_similarity_query(doc) for doc in sources],
+            filters={'min_word_count': 50},  # Exclude very short documents
+            limit=limit,
+            exclude_ids=[doc.id for doc in sources]
+        )
+        
+        return jsonify({
+            'results': [
+                {
+                    'document_id': doc.id,
+                    'similar_documents': [_format_similar_result(result) for result in results]
+                }
+                for doc, results in zip(sources, batch_results)
+            ],
+            'skipped_document_ids': [doc_id for doc_id in document_ids if doc_id not in source_ids]
+        })
+        
+    except InvalidSearchArgs as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Batch similar documents error: {str(e)}")
+        return jsonify({'error': 'Failed to find similar documents'}), 500
+
 @search_bp.route('/advanced', methods=['POST'])
 def advanced_search():
     """Advanced search with complex queries and filters"""
@@ -239,37 +435,50 @@ def advanced_search():
         search_type = search_config.get('type', 'hybrid')
         boost_title = search_config.get('boost_title', False)
         boost_recent = search_config.get('boost_recent', False)
+        _validate_search_options(search_type, limit)
         
         engine = get_search_engine()
         results = engine.search_documents(
             query=query,
             search_type=search_type,
-            filters=filters,
+            filters=_parse_date_filters(filters),
             limit=limit
         )
         
         # Apply additional boosting if requested
-        if boost_title or boost_recent:
-            for result in results:
-                doc = result['document']
-                
-                # Boost documents with query terms in title
-                if boost_title and doc.title:
-                    query_terms = query.lower().split()
-                    title_lower = doc.title.lower()
-                    title_matches = sum(1 for term in query_terms if term in title_lower)
-                    if title_matches > 0:
-                        result['score'] *= (1 + title_matches * 0.2)
-                
-                # Boost recent documents
-                if boost_recent and doc.upload_date:
-                    days_old = (datetime.now() - doc.upload_date).days
-                    if days_old < 30:  # Boost documents less than 30 days old
-                        recency_boost = max(0.1, 1 - (days_old / 30) * 0.3)
-                        result['score'] *= (1 + recency_boost)
+        if results and (boost_title or boost_recent):
+            scores = np.fromiter((r['score'] for r in results), dtype=np.float64, count=len(results))
+            
+            # Boost documents with query terms in title
+            if boost_title:
+                query_terms = query.lower().split()
+                titles = [(r['document'].title or '').lower() for r in results]
+                title_matches = np.fromiter(
+                    (sum(1 for term in query_terms if term in title) for title in titles),
+                    dtype=np.float64, count=len(titles)
+                )
+                scores *= 1 + title_matches * 0.2
+            
+            # Boost documents less than 30 days old
+            if boost_recent:
+                # Upload dates are stored in UTC; compute the window once per request
+                now = datetime.utcnow()
+                cutoff = now - timedelta(days=30)
+                upload_dates = [r['document'].upload_date for r in results]
+                recent = np.fromiter(
+                    (date is not None and date > cutoff for date in upload_dates),
+                    dtype=bool, count=len(upload_dates)
+                )
+                days_old = np.fromiter(
+                    ((now - date).days for date, is_recent in zip(upload_dates, recent) if is_recent),
+                    dtype=np.float64
+                )
+                scores[recent] *= 1 + np.maximum(0.1, 1 - (days_old / 30) * 0.3)
             
             # Re-sort after boosting
-            results.sort(key=lambda x: x['score'], reverse=True)
+            for result, score in zip(results, scores.tolist()):
+                result['score'] = score
+            results = [results[i] for i in np.argsort(-scores, kind='stable')]
         
         # Format results
         formatted_results = []
@@ -291,6 +500,8 @@ def advanced_search():
             'results': formatted_results
         })
         
+    except InvalidSearchArgs as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"Advanced search error: {str(e)}")
         return jsonify({'error': 'Advanced search failed'}), 500
\ No newline at end of file
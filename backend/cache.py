@@ -0,0 +1,32 @@
+from flask import current_app, has_app_context
+from flask_caching import Cache
+import uuid
+
+# Shared cache; configured in create_app() (Redis when REDIS_URL is set)
+cache = Cache()
+
+def cache_available():
+    """Whether the cache can be used here, i.e. inside an app it was initialized for"""
+    return has_app_context() and cache in current_app.extensions.get('cache', {})
+
+def data_version():
+    """
+    Get the current data version token
+
+    The token lives in the cache itself so every worker sees the same value.
+    If it has been evicted a fresh random token is added, which can never
+    collide with an older one and bring stale entries back to life.
+    """
+    version = cache.get('data_version')
+    if version is None:
+        cache.add('data_version', uuid.uuid4().hex, timeout=0)
+        version = cache.get('data_version')
+    return version
+
+def bump_data_version():
+    """Invalidate every cached analytics response after documents or concepts change"""
+    try:
+        cache.set('data_version', uuid.uuid4().hex, timeout=0)
+    except Exception as e:
+        # Called after the change is committed; a cache outage must not fail the request
+        current_app.logger.error(f"Cache invalidation error: {str(e)}")
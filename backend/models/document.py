@@ -1,6 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
-import json
+import orjson
 
 db = SQLAlchemy()
 
@@ -23,7 +23,7 @@ class Document(db.Model):
     page_count = db.Column(db.Integer)
     
     # Processing status
-    processing_status = db.Column(db.String(50), default='pending')  # pending, processing, completed, failed
+    processing_status = db.Column(db.String(50), default='pending', index=True)  # pending, processing, completed, failed
     error_message = db.Column(db.Text)
     
     # Metadata
@@ -32,44 +32,76 @@ class Document(db.Model):
     # Relationships
     concepts = db.relationship('Concept', secondary='document_concepts', back_populates='documents')
     
+    @classmethod
+    def list_columns(cls):
+        """Columns read by row_to_dict(); everything except the full text content"""
+        return (
+            cls.id, cls.filename, cls.original_filename, cls.file_type, cls.file_size,
+            cls.upload_date, cls.processed_date, cls.title, cls.summary, cls.word_count,
+            cls.page_count, cls.processing_status, cls.doc_metadata
+        )
+    
     def to_dict(self):
+        return Document.row_to_dict(self)
+    
+    @staticmethod
+    def row_to_dict(row):
+        """
+        Serialize a Document or a row selected with list_columns()
+        
+        Datetimes are left as is; the app's orjson provider emits them as ISO 8601.
+        """
         return {
-            'id': self.id,
-            'filename': self.filename,
-            'original_filename': self.original_filename,
-            'file_type': self.file_type,
-            'file_size': self.file_size,
-            'upload_date': self.upload_date.isoformat() if self.upload_date else None,
-            'processed_date': self.processed_date.isoformat() if self.processed_date else None,
-            'title': self.title,
-            'summary': self.summary,
-            'word_count': self.word_count,
-            'page_count': self.page_count,
-            'processing_status': self.processing_status,
-            'metadata': json.loads(self.doc_metadata) if self.doc_metadata else {}
+            'id': row.id,
+            'filename': row.filename,
+            'original_filename': row.original_filename,
+            'file_type': row.file_type,
+            'file_size': row.file_size,
+            'upload_date': row.upload_date,
+            'processed_date': row.processed_date,
+            'title': row.title,
+            'summary': row.summary,
+            'word_count': row.word_count,
+            'page_count': row.page_count,
+            'processing_status': row.processing_status,
+            'metadata': orjson.loads(row.doc_metadata) if row.doc_metadata else {}
         }
 
 class Concept(db.Model):
     __tablename__ = 'concepts'
+    __table_args__ = (
+        # Serves frequency-sorted listings; scanned backwards for DESC order
+        db.Index('ix_concepts_frequency_id', 'frequency', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), unique=True, nullable=False)
     description = db.Column(db.Text)
-    category = db.Column(db.String(100))
+    category = db.Column(db.String(100), index=True)
     frequency = db.Column(db.Integer, default=1)
     created_date = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
     documents = db.relationship('Document', secondary='document_concepts', back_populates='concepts')
     
+    @classmethod
+    def list_columns(cls):
+        """Columns read by row_to_dict()"""
+        return (cls.id, cls.name, cls.description, cls.category, cls.frequency, cls.created_date)
+    
     def to_dict(self):
+        return Concept.row_to_dict(self)
+    
+    @staticmethod
+    def row_to_dict(row):
+        """Serialize a Concept or a row selected with list_columns()"""
         return {
-            'id': self.id,
-            'name': self.name,
-            'description': self.description,
-            'category': self.category,
-            'frequency': self.frequency,
-            'created_date': self.created_date.isoformat() if self.created_date else None
+            'id': row.id,
+            'name': row.name,
+            'description': row.description,
+            'category': row.category,
+            'frequency': row.frequency,
+            'created_date': row.created_date
         }
 
 # Association table for many-to-many relationship
@@ -77,11 +109,22 @@ document_concepts = db.Table('document_concepts',
     db.Column('document_id', db.Integer, db.ForeignKey('documents.id'), primary_key=True),
     db.Column('concept_id', db.Integer, db.ForeignKey('concepts.id'), primary_key=True),
     db.Column('relevance_score', db.Float, default=0.0),
-    db.Column('context', db.Text)  # Context where concept appears
+    db.Column('context', db.Text),  # Context where concept appears
+    # The primary key serves lookups by document; this one lookups by concept
+    db.Index('ix_document_concepts_concept_document', 'concept_id', 'document_id')
 )
 
 class ConceptRelation(db.Model):
     __tablename__ = 'concept_relations'
+    __table_args__ = (
+        # Each pair is stored once, lower concept id first
+        db.UniqueConstraint('concept1_id', 'concept2_id', name='uq_concept_relations_pair'),
+        db.CheckConstraint('concept1_id < concept2_id', name='ck_concept_relations_ordered'),
+        # Strength-ordered listings, overall and for the relations of one concept
+        db.Index('ix_concept_relations_strength_id', 'strength', 'id'),
+        db.Index('ix_concept_relations_concept1_strength', 'concept1_id', 'strength'),
+        db.Index('ix_concept_relations_concept2_strength', 'concept2_id', 'strength'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     concept1_id = db.Column(db.Integer, db.ForeignKey('concepts.id'), nullable=False)
@@ -100,5 +143,5 @@ class ConceptRelation(db.Model):
             'concept2': self.concept2.to_dict() if self.concept2 else None,
             'relation_type': self.relation_type,
             'strength': self.strength,
-            'created_date': self.created_date.isoformat() if self.created_date else None
+            'created_date': self.created_date
         }
\ No newline at end of file
@@ -0,0 +1,171 @@
+from sqlalchemy import Integer, and_, column, func, or_, text
+from backend.models.document import Concept, Document
+
+# Which database-specific text indexes were set up by create_search_indexes()
+available_indexes = set()
+
+SQLITE_CONCEPT_FTS = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS concepts_fts
+       USING fts5(name, content='concepts', content_rowid='id', tokenize='trigram')""",
+    """CREATE TRIGGER IF NOT EXISTS concepts_fts_insert AFTER INSERT ON concepts BEGIN
+           INSERT INTO concepts_fts(rowid, name) VALUES (new.id, new.name);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS concepts_fts_delete AFTER DELETE ON concepts BEGIN
+           INSERT INTO concepts_fts(concepts_fts, rowid, name) VALUES ('delete', old.id, old.name);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS concepts_fts_update AFTER UPDATE OF name ON concepts BEGIN
+           INSERT INTO concepts_fts(concepts_fts, rowid, name) VALUES ('delete', old.id, old.name);
+           INSERT INTO concepts_fts(rowid, name) VALUES (new.id, new.name);
+       END""",
+]
+
+SQLITE_DOCUMENT_FTS = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts
+       USING fts5(title, summary, content, content='documents', content_rowid='id', tokenize='trigram')""",
+    """CREATE TRIGGER IF NOT EXISTS documents_fts_insert AFTER INSERT ON documents BEGIN
+           INSERT INTO documents_fts(rowid, title, summary, content)
+           VALUES (new.id, new.title, new.summary, new.content);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS documents_fts_delete AFTER DELETE ON documents BEGIN
+           INSERT INTO documents_fts(documents_fts, rowid, title, summary, content)
+           VALUES ('delete', old.id, old.title, old.summary, old.content);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS documents_fts_update AFTER UPDATE OF title, summary, content ON documents BEGIN
+           INSERT INTO documents_fts(documents_fts, rowid, title, summary, content)
+           VALUES ('delete', old.id, old.title, old.summary, old.content);
+           INSERT INTO documents_fts(rowid, title, summary, content)
+           VALUES (new.id, new.title, new.summary, new.content);
+       END""",
+]
+
+POSTGRES_CONCEPT_TRGM = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_concepts_name_trgm ON concepts USING gin (lower(name) gin_trgm_ops)",
+]
+
+# ILIKE uses these directly, so the document search query is the same with or without them
+POSTGRES_DOCUMENT_TRGM = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_documents_title_trgm ON documents USING gin (title gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_documents_summary_trgm ON documents USING gin (summary gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_documents_content_trgm ON documents USING gin (content gin_trgm_ops)",
+]
+
+# Trigram indexes can only look up terms of at least this many characters
+MIN_TRIGRAM_TERM_LENGTH = 3
+
+def _create_sqlite_fts(engine, table, statements):
+    """Create an FTS5 table and its sync triggers, filling it when it is new"""
+    try:
+        with engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {'name': table}
+            ).first()
+            for statement in statements:
+                conn.execute(text(statement))
+            if not exists:
+                conn.execute(text(f"INSERT INTO {table}({table}) VALUES ('rebuild')"))
+        available_indexes.add(table)
+    except Exception:
+        pass  # SQLite built without FTS5 or the trigram tokenizer
+
+def _create_postgres_indexes(engine, name, statements):
+    """Create PostgreSQL indexes, recording them under name when they exist"""
+    try:
+        with engine.begin() as conn:
+            for statement in statements:
+                conn.execute(text(statement))
+        available_indexes.add(name)
+    except Exception:
+        pass  # pg_trgm not installed or insufficient privileges
+
+def create_search_indexes(engine):
+    """
+    Create the text indexes used for substring search on the current database
+
+    SQLite gets FTS5 trigram tables kept in sync with triggers, PostgreSQL
+    pg_trgm GIN indexes. Both let `LIKE '%term%'` use an index instead of
+    scanning the whole table. Every statement is idempotent, so this is safe
+    to run on each startup; if the database lacks the required extension the
+    plain LIKE fallback is used.
+    """
+    dialect = engine.dialect.name
+
+    if dialect == 'sqlite':
+        _create_sqlite_fts(engine, 'concepts_fts', SQLITE_CONCEPT_FTS)
+        _create_sqlite_fts(engine, 'documents_fts', SQLITE_DOCUMENT_FTS)
+
+    elif dialect == 'postgresql':
+        _create_postgres_indexes(engine, 'concepts_name_trgm', POSTGRES_CONCEPT_TRGM)
+        _create_postgres_indexes(engine, 'documents_trgm', POSTGRES_DOCUMENT_TRGM)
+
+def concept_name_filter(search):
+    """Build a substring filter on concept names that can use the text index"""
+    term = search.lower()
+
+    if 'concepts_fts' in available_indexes:
+        matches = text(
+            "SELECT rowid FROM concepts_fts WHERE name LIKE :concept_name_pattern"
+        ).bindparams(concept_name_pattern=f'%{term}%').columns(column('rowid', Integer))
+        return Concept.id.in_(matches)
+
+    if 'concepts_name_trgm' in available_indexes:
+        return func.lower(Concept.name).contains(term)
+
+    return Concept.name.contains(term)
+
+def concept_prefix_filter(prefix):
+    """Build a filter on concept names starting with prefix that can use the text index"""
+    term = prefix.lower()
+
+    if 'concepts_fts' in available_indexes:
+        matches = text(
+            "SELECT rowid FROM concepts_fts WHERE name LIKE :concept_prefix_pattern"
+        ).bindparams(concept_prefix_pattern=f'{term}%').columns(column('rowid', Integer))
+        return Concept.id.in_(matches)
+
+    if 'concepts_name_trgm' in available_indexes:
+        return func.lower(Concept.name).like(f'{term}%')
+
+    return Concept.name.ilike(f'{term}%')
+
+def document_title_filter(search):
+    """Build a substring filter on document titles that can use the text index"""
+    if 'documents_fts' in available_indexes:
+        matches = text(
+            "SELECT rowid FROM documents_fts WHERE title LIKE :document_title_pattern"
+        ).bindparams(document_title_pattern=f'%{search}%').columns(column('rowid', Integer))
+        return Document.id.in_(matches)
+
+    # The pg_trgm index on title serves ILIKE directly
+    return Document.title.ilike(f'%{search}%')
+
+def document_text_filter(terms):
+    """
+    Build a filter for documents containing every term in their title, summary or content
+
+    With the SQLite FTS table all terms long enough for trigrams are looked up
+    in one MATCH; shorter terms, and every term elsewhere, use ILIKE.
+    """
+    conditions = []
+
+    if 'documents_fts' in available_indexes:
+        indexed = [term for term in terms if len(term) >= MIN_TRIGRAM_TERM_LENGTH]
+        if indexed:
+            # Quoted strings are matched as substrings by the trigram tokenizer
+            expression = ' AND '.join('"' + term.replace('"', '""') + '"' for term in indexed)
+            matches = text(
+                "SELECT rowid FROM documents_fts WHERE documents_fts MATCH :document_match"
+            ).bindparams(document_match=expression).columns(column('rowid', Integer))
+            conditions.append(Document.id.in_(matches))
+        terms = [term for term in terms if len(term) < MIN_TRIGRAM_TERM_LENGTH]
+
+    for term in terms:
+        conditions.append(or_(
+            Document.title.ilike(f'%{term}%'),
+            Document.content.ilike(f'%{term}%'),
+            Document.summary.ilike(f'%{term}%')
+        ))
+
+    return and_(*conditions)
@@ -0,0 +1,21 @@
+from sqlalchemy import event
+
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',  # Readers no longer block on a writer and vice versa
+    'PRAGMA synchronous=NORMAL',  # Safe with WAL; skips an fsync per commit
+    'PRAGMA cache_size=-65536',  # 64MB page cache per connection
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA mmap_size=268435456',  # Let the OS page cache serve reads of the first 256MB
+)
+
+def enable_sqlite_pragmas(engine):
+    """Apply the SQLite tuning pragmas to every new connection of the engine"""
+    if engine.dialect.name != 'sqlite':
+        return
+    
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+        cursor.close()
@@ -1,201 +1,370 @@
 import re
+import hashlib
 import numpy as np
 from collections import defaultdict, Counter
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from functools import lru_cache
+from types import MappingProxyType
+from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer, TfidfTransformer
 from sklearn.cluster import KMeans
+from scipy.sparse import csr_matrix
 from backend.models.document import Concept, ConceptRelation, Document, db, document_concepts
+from backend.cache import cache, cache_available
 import spacy
+from sqlalchemy import insert, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import aliased
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+# Texts are parsed by spaCy in pieces of about this many characters
+NLP_CHUNK_SIZE = 100_000
+
+# Terms never kept as concepts
+COMMON_TERMS = frozenset({'the', 'and', 'for', 'with', 'this', 'that'})
+
+# Extraction results are cached by content hash; bump a version whenever the
+# matching logic changes so stale results are not served
+EXTRACTION_CACHE_VERSION = 3
+NLP_CACHE_VERSION = 3
+EXTRACTION_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+
+# Predefined HCI concepts and terminology, shared read-only by every analyzer
+HCI_CONCEPTS = MappingProxyType({
+    'interaction_design': (
+        'user interface', 'ui', 'user experience', 'ux', 'interaction design',
+        'interface design', 'usability', 'accessibility', 'user-centered design',
+        'human-centered design', 'design thinking', 'wireframe', 'prototype',
+        'mockup', 'user flow', 'information architecture', 'navigation'
+    ),
+    'usability': (
+        'usability testing', 'user testing', 'heuristic evaluation', 'cognitive walkthrough',
+        'task analysis', 'user study', 'usability metrics', 'effectiveness',
+        'efficiency', 'satisfaction', 'learnability', 'memorability', 'error prevention'
+    ),
+    'cognitive_psychology': (
+        'cognitive load', 'mental model', 'working memory', 'attention',
+        'perception', 'cognition', 'cognitive science', 'human factors',
+        'cognitive ergonomics', 'information processing', 'decision making'
+    ),
+    'input_methods': (
+        'mouse', 'keyboard', 'touchscreen', 'gesture', 'voice input',
+        'eye tracking', 'brain-computer interface', 'haptic feedback',
+        'multimodal interaction', 'natural user interface', 'tangible interface'
+    ),
+    'evaluation_methods': (
+        'user evaluation', 'empirical study', 'controlled experiment',
+        'field study', 'ethnography', 'survey', 'interview', 'focus group',
+        'observation', 'think-aloud protocol', 'a/b testing'
+    ),
+    'design_principles': (
+        'affordance', 'feedback', 'visibility', 'consistency', 'constraint',
+        'mapping', 'conceptual model', 'gulf of execution', 'gulf of evaluation',
+        'norman door', 'fitts law', 'hicks law', 'gestalt principles'
+    ),
+    'accessibility': (
+        'web accessibility', 'wcag', 'screen reader', 'assistive technology',
+        'universal design', 'inclusive design', 'disability', 'barrier-free',
+        'alt text', 'keyboard navigation', 'color contrast'
+    ),
+    'mobile_computing': (
+        'mobile interface', 'responsive design', 'touch interaction',
+        'mobile usability', 'context-aware computing', 'location-based',
+        'augmented reality', 'virtual reality', 'mixed reality'
+    ),
+    'social_computing': (
+        'social media', 'collaborative system', 'computer-mediated communication',
+        'online community', 'social network', 'crowdsourcing',
+        'social presence', 'computer-supported cooperative work', 'cscw'
+    ),
+    'visualization': (
+        'information visualization', 'data visualization', 'visual analytics',
+        'scientific visualization', 'dashboard', 'chart', 'graph',
+        'interactive visualization', 'visual encoding', 'visual perception'
+    )
+})
+
+def _compile_concept_patterns(hci_concepts):
+    """
+    Compile one regex matching every known concept
+    
+    A single alternation scans the text once instead of once per category.
+    Longer terms come first so 'usability testing' wins over 'usability'
+    at the same position; the category of a match is looked up by its
+    casefolded text, since IGNORECASE also folds letters lower() keeps
+    (e.g. 'ſ' matches 's').
+    """
+    categories = {}
+    for category, concepts in hci_concepts.items():
+        for concept in concepts:
+            categories.setdefault(concept.casefold(), category)
+    
+    terms = sorted(categories, key=len, reverse=True)
+    alternation = '|'.join(re.escape(term) for term in terms)
+    return re.compile(r'\b(?:' + alternation + r')\b', re.IGNORECASE), MappingProxyType(categories)
+
+CONCEPT_PATTERN, CONCEPT_CATEGORIES = _compile_concept_patterns(HCI_CONCEPTS)
+
+# Statistical extraction tokenizer and hasher; the hasher is stateless, so one
+# instance serves all documents without refitting a vocabulary
+NGRAM_ANALYZER = CountVectorizer(ngram_range=(1, 3), stop_words='english').build_analyzer()
+NGRAM_HASHER = HashingVectorizer(
+    n_features=2 ** 20,
+    analyzer=lambda tokens: tokens,
+    alternate_sign=False,
+    norm=None
+)
+
+def _chunk_text(text, max_chars=NLP_CHUNK_SIZE):
+    """
+    Split text at sentence boundaries into pieces of about max_chars
+    
+    Returns (offset, piece) pairs, where offset is the position of the piece
+    in text. A single sentence longer than max_chars is kept whole.
+    """
+    chunks = []
+    start = end = 0
+    for boundary in SENTENCE_BOUNDARY.finditer(text):
+        if boundary.end() - start > max_chars and end > start:
+            chunks.append((start, text[start:end]))
+            start = end
+        end = boundary.end()
+    if len(text) - start > max_chars and end > start:
+        chunks.append((start, text[start:end]))
+        start = end
+    chunks.append((start, text[start:]))
+    return chunks
+
+@lru_cache(maxsize=1)
+def _load_nlp():
+    """Load the spaCy model once per process; None when it is not installed"""
+    try:
+        # Noun chunks need the tagger, attribute ruler and parser; lemmas are never read
+        return spacy.load("en_core_web_sm", disable=["lemmatizer"])
+    except OSError:
+        return None
 
 class ConceptAnalyzer:
     def __init__(self):
         self.setup_nlp()
+        self.setup_statistical_extractor()
         self.hci_concepts = self.load_hci_concepts()
         self.concept_patterns = self.create_concept_patterns()
     
     def setup_nlp(self):
         """Setup NLP pipeline"""
-        try:
-            self.nlp = spacy.load("en_core_web_sm")
-        except OSError:
-            self.nlp = None
+        self.nlp = _load_nlp()
+        # Part of the cache keys, so a model upgrade invalidates cached NLP results
+        self.nlp_version = f"{self.nlp.meta['name']}-{self.nlp.meta['version']}" if self.nlp else 'none'
+    
+    def setup_statistical_extractor(self):
+        """Setup the n-gram tokenizer and hasher shared by every statistical extraction"""
+        self.ngram_analyzer = NGRAM_ANALYZER
+        self.ngram_hasher = NGRAM_HASHER
     
     def load_hci_concepts(self):
         """Load predefined HCI concepts and terminology"""
-        return {
-            'interaction_design': [
-                'user interface', 'ui', 'user experience', 'ux', 'interaction design',
-                'interface design', 'usability', 'accessibility', 'user-centered design',
-                'human-centered design', 'design thinking', 'wireframe', 'prototype',
-                'mockup', 'user flow', 'information architecture', 'navigation'
-            ],
-            'usability': [
-                'usability testing', 'user testing', 'heuristic evaluation', 'cognitive walkthrough',
-                'task analysis', 'user study', 'usability metrics', 'effectiveness',
-                'efficiency', 'satisfaction', 'learnability', 'memorability', 'error prevention'
-            ],
-            'cognitive_psychology': [
-                'cognitive load', 'mental model', 'working memory', 'attention',
-                'perception', 'cognition', 'cognitive science', 'human factors',
-                'cognitive ergonomics', 'information processing', 'decision making'
-            ],
-            'input_methods': [
-                'mouse', 'keyboard', 'touchscreen', 'gesture', 'voice input',
-                'eye tracking', 'brain-computer interface', 'haptic feedback',
-                'multimodal interaction', 'natural user interface', 'tangible interface'
-            ],
-            'evaluation_methods': [
-                'user evaluation', 'empirical study', 'controlled experiment',
-                'field study', 'ethnography', 'survey', 'interview', 'focus group',
-                'observation', 'think-aloud protocol', 'a/b testing'
-            ],
-            'design_principles': [
-                'affordance', 'feedback', 'visibility', 'consistency', 'constraint',
-                'mapping', 'conceptual model', 'gulf of execution', 'gulf of evaluation',
-                'norman door', 'fitts law', 'hicks law', 'gestalt principles'
-            ],
-            'accessibility': [
-                'web accessibility', 'wcag', 'screen reader', 'assistive technology',
-                'universal design', 'inclusive design', 'disability', 'barrier-free',
-                'alt text', 'keyboard navigation', 'color contrast'
-            ],
-            'mobile_computing': [
-                'mobile interface', 'responsive design', 'touch interaction',
-                'mobile usability', 'context-aware computing', 'location-based',
-                'augmented reality', 'virtual reality', 'mixed reality'
-            ],
-            'social_computing': [
-                'social media', 'collaborative system', 'computer-mediated communication',
-                'online community', 'social network', 'crowdsourcing',
-                'social presence', 'computer-supported cooperative work', 'cscw'
-            ],
-            'visualization': [
-                'information visualization', 'data visualization', 'visual analytics',
-                'scientific visualization', 'dashboard', 'chart', 'graph',
-                'interactive visualization', 'visual encoding', 'visual perception'
-            ]
-        }
+        return HCI_CONCEPTS
     
     def create_concept_patterns(self):
-        """Create regex patterns for concept detection"""
-        patterns = {}
-        for category, concepts in self.hci_concepts.items():
-            category_patterns = []
-            for concept in concepts:
-                # Create pattern that matches the concept with word boundaries
-                pattern = r'\b' + re.escape(concept.lower()) + r'\b'
-                category_patterns.append(pattern)
-            patterns[category] = '|'.join(category_patterns)
-        return patterns
+        """Get the compiled regex matching every known concept"""
+        self.concept_categories = CONCEPT_CATEGORIES
+        return CONCEPT_PATTERN
     
-    def extract_concepts_from_text(self, text, document_id=None):
-        """Extract concepts from text using multiple methods"""
+    def extract_concepts_from_text(self, text, document_id=None, nlp_docs=None):
+        """
+        Extract concepts from text using multiple methods
+        
+        nlp_docs are the (offset, doc) pairs of the text already parsed by
+        spaCy, e.g. from nlp.pipe() in process_documents_batch(); otherwise
+        the text is parsed here.
+        """
         if not text:
             return []
         
-        text_lower = text.lower()
+        use_cache = cache_available()
+        if use_cache:
+            cache_key, nlp_cache_key = self._extraction_cache_keys(text)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
         found_concepts = []
         
         # 1. Pattern-based concept extraction
-        for category, pattern in self.concept_patterns.items():
-            matches = re.finditer(pattern, text_lower)
-            for match in matches:
-                concept_text = match.group()
-                context = self._extract_context(text, match.start(), match.end())
-                
-                found_concepts.append({
-                    'name': concept_text,
-                    'category': category,
-                    'context': context,
-                    'position': match.start(),
-                    'confidence': 0.9  # High confidence for pattern matches
-                })
+        for match in self.concept_patterns.finditer(text):
+            concept_text = match.group().casefold()
+            category = self.concept_categories.get(concept_text)
+            if category is None:
+                continue
+            
+            found_concepts.append({
+                'name': concept_text,
+                'category': category,
+                'context_span': self._context_span(text, match.start(), match.end()),
+                'position': match.start(),
+                'confidence': 0.9  # High confidence for pattern matches
+            })
         
         # 2. NLP-based concept extraction
+        sentences = None
         if self.nlp:
-            nlp_concepts = self._extract_nlp_concepts(text)
-            found_concepts.extend(nlp_concepts)
+            # Cached separately so changes to the other steps keep the spaCy work
+            nlp_result = cache.get(nlp_cache_key) if use_cache else None
+            if nlp_result is None:
+                if nlp_docs is None:
+                    nlp_docs = self._parse_text(text)
+                nlp_result = {
+                    'concepts': self._extract_nlp_concepts(text, nlp_docs),
+                    'sentences': [
+                        (offset + sentence.start_char, offset + sentence.end_char)
+                        for offset, doc in nlp_docs for sentence in doc.sents
+                    ]
+                }
+                if use_cache:
+                    cache.set(nlp_cache_key, nlp_result, timeout=EXTRACTION_CACHE_TIMEOUT)
+            found_concepts.extend(nlp_result['concepts'])
+            sentences = [text[start:end] for start, end in nlp_result['sentences']]
         
         # 3. Statistical concept extraction
-        statistical_concepts = self._extract_statistical_concepts(text)
+        statistical_concepts = self._extract_statistical_concepts(text, sentences)
         found_concepts.extend(statistical_concepts)
         
         # Remove duplicates and rank by confidence
         unique_concepts = self._deduplicate_concepts(found_concepts)
         
-        return sorted(unique_concepts, key=lambda x: x['confidence'], reverse=True)
+        concepts = sorted(unique_concepts, key=lambda x: x['confidence'], reverse=True)
+        
+        # Only the mentions that survived deduplication get their context copied out
+        for concept in concepts:
+            span = concept.pop('context_span', None)
+            if span is not None:
+                context_start, context_end = span
+                concept['context'] = text[context_start:context_end].strip()
+        
+        if use_cache:
+            cache.set(cache_key, concepts, timeout=EXTRACTION_CACHE_TIMEOUT)
+        return concepts
+    
+    def _extraction_cache_keys(self, text):
+        """Cache keys for the extraction result and the NLP step of a text"""
+        digest = hashlib.blake2b(text.encode('utf-8'), digest_size=20).hexdigest()
+        return (
+            f'concepts:v{EXTRACTION_CACHE_VERSION}:{self.nlp_version}:{digest}',
+            f'nlp_concepts:v{NLP_CACHE_VERSION}:{self.nlp_version}:{digest}'
+        )
+    
+    def _context_span(self, text, start, end, window=100):
+        """Get the offsets of the context around a concept mention"""
+        return max(0, start - window), min(len(text), end + window)
     
-    def _extract_context(self, text, start, end, window=100):
-        """Extract context around a concept mention"""
-        context_start = max(0, start - window)
-        context_end = min(len(text), end + window)
-        return text[context_start:context_end].strip()
+    def _parse_text(self, text):
+        """
+        Parse text with spaCy in sentence-aligned chunks
+        
+        The parser's memory grows with the input, so very large documents go
+        through nlp.pipe() piece by piece. Returns (offset, doc) pairs.
+        """
+        chunks = _chunk_text(text)
+        docs = self.nlp.pipe((chunk for _, chunk in chunks), batch_size=8)
+        return [(offset, doc) for (offset, _), doc in zip(chunks, docs)]
     
-    def _extract_nlp_concepts(self, text):
+    def _extract_nlp_concepts(self, text, docs=None):
         """Extract concepts using NLP techniques"""
         concepts = []
-        doc = self.nlp(text)
-        
-        # Extract noun phrases as potential concepts
-        for chunk in doc.noun_chunks:
-            if len(chunk.text.strip()) > 3 and len(chunk.text.split()) <= 4:
-                concepts.append({
-                    'name': chunk.text.lower().strip(),
-                    'category': 'extracted',
-                    'context': self._extract_context(text, chunk.start_char, chunk.end_char),
-                    'position': chunk.start_char,
-                    'confidence': 0.6
-                })
-        
-        # Extract named entities
-        for ent in doc.ents:
-            if ent.label_ in ['PERSON', 'ORG', 'PRODUCT', 'EVENT'] and len(ent.text.strip()) > 2:
-                concepts.append({
-                    'name': ent.text.lower().strip(),
-                    'category': f'entity_{ent.label_.lower()}',
-                    'context': self._extract_context(text, ent.start_char, ent.end_char),
-                    'position': ent.start_char,
-                    'confidence': 0.7
-                })
+        if docs is None:
+            docs = self._parse_text(text)
+        
+        for offset, doc in docs:
+            # Extract noun phrases as potential concepts
+            for chunk in doc.noun_chunks:
+                if len(chunk.text.strip()) > 3 and len(chunk.text.split()) <= 4:
+                    concepts.append({
+                        'name': chunk.text.lower().strip(),
+                        'category': 'extracted',
+                        'context_span': self._context_span(text, offset + chunk.start_char, offset + chunk.end_char),
+                        'position': offset + chunk.start_char,
+                        'confidence': 0.6
+                    })
+            
+            # Extract named entities
+            for ent in doc.ents:
+                if ent.label_ in ['PERSON', 'ORG', 'PRODUCT', 'EVENT'] and len(ent.text.strip()) > 2:
+                    concepts.append({
+                        'name': ent.text.lower().strip(),
+                        'category': f'entity_{ent.label_.lower()}',
+                        'context_span': self._context_span(text, offset + ent.start_char, offset + ent.end_char),
+                        'position': offset + ent.start_char,
+                        'confidence': 0.7
+                    })
         
         return concepts
     
-    def _extract_statistical_concepts(self, text):
-        """Extract concepts using statistical methods"""
+    def _extract_statistical_concepts(self, text, sentences=None):
+        """
+        Extract concepts using statistical methods
+        
+        sentences are the sentence texts found by spaCy; without them the
+        text is split at sentence-ending punctuation.
+        """
         concepts = []
         
         # Use TF-IDF to find important terms
-        sentences = [s.strip() for s in text.split('.') if len(s.strip()) > 20]
+        if sentences is None:
+            sentences = SENTENCE_BOUNDARY.split(text)
+        sentences = [s.strip() for s in sentences if len(s.strip()) > 20]
         if len(sentences) < 2:
             return concepts
         
         try:
-            vectorizer = TfidfVectorizer(
-                max_features=50,
-                ngram_range=(1, 3),
-                stop_words='english',
-                min_df=1,
-                max_df=0.8
-            )
+            sentence_terms = [self.ngram_analyzer(sentence) for sentence in sentences]
+            hashed = self.ngram_hasher.transform(sentence_terms)
             
-            tfidf_matrix = vectorizer.fit_transform(sentences)
-            feature_names = vectorizer.get_feature_names_out()
+            # Compact the hashed columns down to the ones this document uses
+            hashes, columns, doc_freq = np.unique(hashed.indices, return_inverse=True, return_counts=True)
+            term_freq = np.bincount(columns, weights=hashed.data)
+            counts = csr_matrix((hashed.data, columns, hashed.indptr), shape=(len(sentences), len(hashes)))
+            
+            # Keep the 50 most frequent terms that occur in at most 80% of sentences
+            kept = np.flatnonzero(doc_freq <= 0.8 * len(sentences))
+            if len(kept) > 50:
+                kept = kept[np.argpartition(-term_freq[kept], 50)[:50]]
+            if not len(kept):
+                return concepts
             
             # Get average TF-IDF scores
-            mean_scores = np.mean(tfidf_matrix.toarray(), axis=0)
+            tfidf_matrix = TfidfTransformer().fit_transform(counts[:, kept])
+            mean_scores = np.asarray(tfidf_matrix.mean(axis=0)).ravel()
+            
+            # Hashing drops the terms themselves; recover them for the significant columns only
+            is_significant = mean_scores > 0.1
+            significant = dict(zip(hashes[kept[is_significant]].tolist(), mean_scores[is_significant].tolist()))
+            if not significant:
+                return concepts
+            term_counts = Counter(term for terms in sentence_terms for term in terms)
+            unique_terms = list(term_counts)
+            term_hashes = self.ngram_hasher.transform([[term] for term in unique_terms]).indices
+            
+            # Terms that collide on a column are named after the most frequent one
+            def rank(term):
+                return -term_counts[term], term
+            
+            names = {}
+            for term, term_hash in zip(unique_terms, term_hashes.tolist()):
+                if term_hash in significant and (term_hash not in names or rank(term) < rank(names[term_hash])):
+                    names[term_hash] = term
             
             # Extract top scoring terms as concepts
-            for i, score in enumerate(mean_scores):
-                if score > 0.1:  # Threshold for significance
-                    term = feature_names[i]
-                    if len(term) > 3 and not term.isdigit():
-                        concepts.append({
-                            'name': term,
-                            'category': 'statistical',
-                            'context': '',
-                            'position': 0,
-                            'confidence': min(score * 2, 0.8)  # Scale confidence
-                        })
+            for term_hash, term in names.items():
+                score = significant[term_hash]
+                if len(term) > 3 and not term.isdigit():
+                    concepts.append({
+                        'name': term,
+                        'category': 'statistical',
+                        'context': '',
+                        'position': 0,
+                        'confidence': min(score * 2, 0.8)  # Scale confidence
+                    })
         
         except Exception:
             pass  # Skip if TF-IDF fails
@@ -203,125 +372,239 @@ class ConceptAnalyzer:
         return concepts
     
     def _deduplicate_concepts(self, concepts):
-        """Remove duplicate concepts and merge similar ones"""
+        """
+        Remove duplicate concepts and merge similar ones
+        
+        Every extraction step already emits lowercased, stripped names, so
+        they are used as keys directly.
+        """
         unique_concepts = {}
         
         for concept in concepts:
-            name = concept['name'].strip().lower()
+            name = concept['name']
             
             # Skip very short or common terms
-            if len(name) < 3 or name in ['the', 'and', 'for', 'with', 'this', 'that']:
+            if len(name) < 3 or name in COMMON_TERMS:
                 continue
             
-            if name in unique_concepts:
-                # Keep the one with higher confidence
-                if concept['confidence'] > unique_concepts[name]['confidence']:
-                    unique_concepts[name] = concept
-            else:
+            # Keep the one with higher confidence
+            kept = unique_concepts.setdefault(name, concept)
+            if concept['confidence'] > kept['confidence']:
                 unique_concepts[name] = concept
         
         return list(unique_concepts.values())
     
     def save_concepts_to_db(self, concepts, document_id):
-        """Save extracted concepts to database"""
-        saved_concepts = []
-        
+        """
+        Save extracted concepts to database
+        
+        Works in bulk: one query finds the concepts that already exist, one
+        UPDATE bumps their frequency, one multi-row INSERT adds the new ones
+        and another links them all to the document.
+        """
+        # Concepts are deduplicated by name; keep the first entry for a name
+        concepts_by_name = {}
         for concept_data in concepts:
-            # Check if concept already exists
-            concept = Concept.query.filter_by(name=concept_data['name']).first()
-            
-            if not concept:
-                # Create new concept
-                concept = Concept(
-                    name=concept_data['name'],
-                    category=concept_data['category'],
-                    description=concept_data.get('context', '')[:500]  # Limit description length
-                )
-                db.session.add(concept)
-                db.session.flush()  # Get the ID
-            else:
-                # Update frequency
-                concept.frequency += 1
-            
-            # Link concept to document
-            existing_link = db.session.query(document_concepts).filter_by(
-                document_id=document_id,
-                concept_id=concept.id
-            ).first()
-            
-            if not existing_link:
-                # Create new document-concept relationship
-                stmt = document_concepts.insert().values(
-                    document_id=document_id,
-                    concept_id=concept.id,
-                    relevance_score=concept_data['confidence'],
-                    context=concept_data.get('context', '')[:1000]
-                )
-                db.session.execute(stmt)
-            
-            saved_concepts.append(concept)
+            concepts_by_name.setdefault(concept_data['name'], concept_data)
+        names = list(concepts_by_name)
+        if not names:
+            db.session.commit()
+            return []
+        
+        existing = {
+            concept.name: concept
+            for concept in Concept.query.filter(Concept.name.in_(names)).all()
+        }
+        
+        if existing:
+            # Update frequency
+            db.session.execute(
+                update(Concept)
+                .where(Concept.id.in_([concept.id for concept in existing.values()]))
+                .values(frequency=Concept.frequency + 1)
+            )
+        
+        new_names = [name for name in names if name not in existing]
+        if new_names:
+            # Create new concepts
+            db.session.execute(insert(Concept), [
+                {
+                    'name': name,
+                    'category': concepts_by_name[name]['category'],
+                    'description': concepts_by_name[name].get('context', '')[:500]  # Limit description length
+                }
+                for name in new_names
+            ])
+            existing.update(
+                (concept.name, concept)
+                for concept in Concept.query.filter(Concept.name.in_(new_names)).all()
+            )
+        
+        saved_concepts = [existing[name] for name in names]
+        
+        # Link concepts the document is not linked to yet
+        linked_ids = {
+            concept_id for (concept_id,) in db.session.query(document_concepts.c.concept_id).filter(
+                document_concepts.c.document_id == document_id,
+                document_concepts.c.concept_id.in_([concept.id for concept in saved_concepts])
+            )
+        }
+        new_links = [
+            {
+                'document_id': document_id,
+                'concept_id': concept.id,
+                'relevance_score': concepts_by_name[concept.name]['confidence'],
+                'context': concepts_by_name[concept.name].get('context', '')[:1000]
+            }
+            for concept in saved_concepts if concept.id not in linked_ids
+        ]
+        if new_links:
+            db.session.execute(document_concepts.insert(), new_links)
         
         db.session.commit()
         return saved_concepts
     
-    def find_concept_relations(self, concept_id, similarity_threshold=0.3):
-        """Find related concepts using various similarity measures"""
-        concept = Concept.query.get(concept_id)
-        if not concept:
+    def _build_similarity_index(self):
+        """
+        Load everything concept similarity needs for all concepts at once
+        
+        Names become a concept x word matrix and document links a concept x
+        document matrix, so one concept can be compared with every other
+        concept through two sparse products instead of per-pair queries. Both
+        only hold ones and their products are small counts, which float32
+        represents exactly at half the memory of float64.
+        """
+        concepts = db.session.query(Concept.id, Concept.name, Concept.category).order_by(Concept.id).all()
+        rows = {concept.id: row for row, concept in enumerate(concepts)}
+        
+        vocabulary = {}
+        word_rows, word_columns = [], []
+        for row, concept in enumerate(concepts):
+            for word in set(concept.name.lower().split()):
+                word_rows.append(row)
+                word_columns.append(vocabulary.setdefault(word, len(vocabulary)))
+        words = csr_matrix(
+            (np.ones(len(word_rows), dtype=np.float32), (word_rows, word_columns)),
+            shape=(len(concepts), len(vocabulary))
+        )
+        
+        document_columns = {}
+        link_rows, link_columns = [], []
+        for concept_id, document_id in db.session.query(document_concepts.c.concept_id, document_concepts.c.document_id):
+            if concept_id in rows:
+                link_rows.append(rows[concept_id])
+                link_columns.append(document_columns.setdefault(document_id, len(document_columns)))
+        documents = csr_matrix(
+            (np.ones(len(link_rows), dtype=np.float32), (link_rows, link_columns)),
+            shape=(len(concepts), len(document_columns))
+        )
+        
+        category_codes = {}
+        return {
+            'concepts': concepts,
+            'rows': rows,
+            'words': words,
+            'word_counts': np.diff(words.indptr),
+            'documents': documents,
+            'document_counts': np.diff(documents.indptr),
+            'categories': np.array([category_codes.setdefault(concept.category, len(category_codes)) for concept in concepts])
+        }
+    
+    def find_concept_relations(self, concept_id, similarity_threshold=0.3, index=None):
+        """
+        Find related concepts using various similarity measures
+        
+        index is a _build_similarity_index() result to reuse across calls;
+        it is built here when omitted.
+        """
+        if index is None:
+            index = self._build_similarity_index()
+        
+        row = index['rows'].get(concept_id)
+        if row is None:
             return []
         
-        # Get all other concepts
-        other_concepts = Concept.query.filter(Concept.id != concept_id).all()
-        relations = []
+        similarities = self._calculate_concept_similarities(index, row)
+        similarities[row] = 0.0  # Never relate a concept to itself
+        candidates = np.flatnonzero(similarities > similarity_threshold)
+        if not len(candidates):
+            return []
+        
+        # Concepts already related to this one, in either direction
+        existing = {
+            concept1_id if concept2_id == concept_id else concept2_id
+            for concept1_id, concept2_id in db.session.query(
+                ConceptRelation.concept1_id, ConceptRelation.concept2_id
+            ).filter(
+                (ConceptRelation.concept1_id == concept_id) |
+                (ConceptRelation.concept2_id == concept_id)
+            )
+        }
         
-        for other_concept in other_concepts:
-            similarity = self._calculate_concept_similarity(concept, other_concept)
+        concept = index['concepts'][row]
+        relations = []
+        for candidate in candidates.tolist():
+            other_concept = index['concepts'][candidate]
+            if other_concept.id in existing:
+                continue
             
-            if similarity > similarity_threshold:
-                relation_type = self._determine_relation_type(concept, other_concept, similarity)
-                
-                # Check if relation already exists
-                existing = ConceptRelation.query.filter(
-                    ((ConceptRelation.concept1_id == concept.id) & 
-                     (ConceptRelation.concept2_id == other_concept.id)) |
-                    ((ConceptRelation.concept1_id == other_concept.id) & 
-                     (ConceptRelation.concept2_id == concept.id))
-                ).first()
-                
-                if not existing:
-                    relation = ConceptRelation(
-                        concept1_id=concept.id,
-                        concept2_id=other_concept.id,
-                        relation_type=relation_type,
-                        strength=similarity
-                    )
-                    relations.append(relation)
+            similarity = float(similarities[candidate])
+            relations.append(ConceptRelation(
+                concept1_id=min(concept.id, other_concept.id),
+                concept2_id=max(concept.id, other_concept.id),
+                relation_type=self._determine_relation_type(concept, other_concept, similarity),
+                strength=similarity
+            ))
         
         return relations
     
-    def _calculate_concept_similarity(self, concept1, concept2):
-        """Calculate similarity between two concepts"""
-        similarity_score = 0.0
-        
+    def save_relations(self, relations):
+        """Insert relations in one statement, skipping pairs that already exist"""
+        rows = {}
+        for relation in relations:
+            rows.setdefault((relation.concept1_id, relation.concept2_id), {
+                'concept1_id': relation.concept1_id,
+                'concept2_id': relation.concept2_id,
+                'relation_type': relation.relation_type,
+                'strength': relation.strength
+            })
+        if not rows:
+            return
+        
+        dialect = db.engine.dialect.name
+        if dialect == 'sqlite':
+            stmt = sqlite_insert(ConceptRelation).on_conflict_do_nothing()
+        elif dialect == 'postgresql':
+            stmt = postgresql_insert(ConceptRelation).on_conflict_do_nothing()
+        else:
+            stmt = insert(ConceptRelation)
+        db.session.execute(stmt, list(rows.values()))
+    
+    def _calculate_concept_similarities(self, index, row):
+        """Calculate the similarity between one concept and every concept in the index"""
         # 1. Name similarity (Jaccard similarity of words)
-        words1 = set(concept1.name.lower().split())
-        words2 = set(concept2.name.lower().split())
-        
-        if words1 and words2:
-            jaccard = len(words1.intersection(words2)) / len(words1.union(words2))
-            similarity_score += jaccard * 0.4
+        word_counts = index['word_counts']
+        shared_words = (index['words'][row] @ index['words'].T).toarray().ravel()
+        word_union = word_counts[row] + word_counts - shared_words
+        # The weighted sum is accumulated in place in this buffer
+        similarities = np.divide(shared_words, word_union, out=np.zeros(len(word_union)), where=word_union > 0)
+        similarities *= 0.4
         
         # 2. Category similarity
-        if concept1.category == concept2.category:
-            similarity_score += 0.3
+        similarities[index['categories'] == index['categories'][row]] += 0.3
         
         # 3. Co-occurrence in documents
-        common_docs = set([d.id for d in concept1.documents]) & set([d.id for d in concept2.documents])
-        if common_docs:
-            co_occurrence = len(common_docs) / max(len(concept1.documents), len(concept2.documents))
-            similarity_score += co_occurrence * 0.3
-        
-        return min(similarity_score, 1.0)
+        document_counts = index['document_counts']
+        shared_documents = (index['documents'][row] @ index['documents'].T).toarray().ravel()
+        most_documents = np.maximum(document_counts[row], document_counts)
+        co_occurrence = np.divide(
+            shared_documents, most_documents,
+            out=np.zeros(len(most_documents)), where=shared_documents > 0
+        )
+        co_occurrence *= 0.3
+        similarities += co_occurrence
+        
+        return np.minimum(similarities, 1.0, out=similarities)
     
     def _determine_relation_type(self, concept1, concept2, similarity):
         """Determine the type of relationship between concepts"""
@@ -337,31 +620,54 @@ class ConceptAnalyzer:
         else:
             return 'weak_relation'
     
-    def build_concept_graph(self, min_strength=0.3):
-        """Build a graph of concept relationships"""
-        concepts = Concept.query.all()
-        relations = ConceptRelation.query.filter(ConceptRelation.strength >= min_strength).all()
+    def build_concept_graph(self, min_strength=0.3, category=None):
+        """Build a graph of concept relationships, optionally limited to one category"""
+        # Plain column rows; the graph only needs a few fields of each object
+        concept_query = db.session.query(Concept.id, Concept.name, Concept.category, Concept.frequency)
+        relation_query = db.session.query(
+            ConceptRelation.concept1_id,
+            ConceptRelation.concept2_id,
+            ConceptRelation.relation_type,
+            ConceptRelation.strength
+        ).filter(ConceptRelation.strength >= min_strength)
+        
+        if category:
+            # Only keep edges whose endpoints both belong to the category
+            source = aliased(Concept)
+            target = aliased(Concept)
+            concept_query = concept_query.filter(Concept.category == category)
+            relation_query = relation_query.join(
+                source, ConceptRelation.concept1_id == source.id
+            ).join(
+                target, ConceptRelation.concept2_id == target.id
+            ).filter(
+                source.category == category,
+                target.category == category
+            )
+        
+        concepts = concept_query.all()
+        relations = relation_query.all()
         
         graph = {
             'nodes': [
                 {
-                    'id': concept.id,
-                    'name': concept.name,
-                    'category': concept.category,
-                    'frequency': concept.frequency,
-                    'size': min(concept.frequency * 2, 20)  # Node size based on frequency
+                    'id': concept_id,
+                    'name': name,
+                    'category': concept_category,
+                    'frequency': frequency,
+                    'size': min(frequency * 2, 20)  # Node size based on frequency
                 }
-                for concept in concepts
+                for concept_id, name, concept_category, frequency in concepts
             ],
             'edges': [
                 {
-                    'source': relation.concept1_id,
-                    'target': relation.concept2_id,
-                    'type': relation.relation_type,
-                    'strength': relation.strength,
-                    'width': relation.strength * 5  # Edge width based on strength
+                    'source': concept1_id,
+                    'target': concept2_id,
+                    'type': relation_type,
+                    'strength': strength,
+                    'width': strength * 5  # Edge width based on strength
                 }
-                for relation in relations
+                for concept1_id, concept2_id, relation_type, strength in relations
             ]
         }
         
@@ -369,32 +675,35 @@ class ConceptAnalyzer:
     
     def suggest_related_documents(self, document_id, limit=5):
         """Suggest documents related to the given document based on shared concepts"""
-        document = Document.query.get(document_id)
-        if not document:
-            return []
-        
-        # Get concepts for this document
-        doc_concepts = [c.id for c in document.concepts]
-        
-        if not doc_concepts:
-            return []
+        # Concepts of this document; none when it does not exist
+        doc_concepts = select(document_concepts.c.concept_id).where(
+            document_concepts.c.document_id == document_id
+        )
+        
+        # Count shared concepts on the association table alone, then fetch
+        # titles and summaries only for the documents that make the cut
+        shared = db.session.query(
+            document_concepts.c.document_id,
+            db.func.count().label('shared_concepts')
+        ).filter(
+            document_concepts.c.concept_id.in_(doc_concepts),
+            document_concepts.c.document_id != document_id
+        ).group_by(
+            document_concepts.c.document_id
+        ).order_by(
+            db.desc('shared_concepts')
+        ).limit(limit).subquery()
         
-        # Find documents that share concepts
         related_docs = db.session.query(
             Document.id,
             Document.title,
             Document.summary,
-            db.func.count(document_concepts.c.concept_id).label('shared_concepts')
+            shared.c.shared_concepts
         ).join(
-            document_concepts, Document.id == document_concepts.c.document_id
-        ).filter(
-            document_concepts.c.concept_id.in_(doc_concepts),
-            Document.id != document_id
-        ).group_by(
-            Document.id, Document.title, Document.summary
+            shared, Document.id == shared.c.document_id
         ).order_by(
-            db.desc('shared_concepts')
-        ).limit(limit).all()
+            shared.c.shared_concepts.desc()
+        ).all()
         
         return [
             {
@@ -408,26 +717,62 @@ class ConceptAnalyzer:
     
     def process_document_concepts(self, document_id):
         """Complete concept processing pipeline for a document"""
-        document = Document.query.get(document_id)
-        if not document or not document.content:
-            return []
-        
-        # Extract concepts from document content
-        concepts = self.extract_concepts_from_text(document.content, document_id)
-        
-        # Save concepts to database
-        saved_concepts = self.save_concepts_to_db(concepts, document_id)
-        
-        # Find and save concept relations
-        all_relations = []
-        for concept in saved_concepts:
-            relations = self.find_concept_relations(concept.id)
-            all_relations.extend(relations)
-        
-        # Save relations to database
-        for relation in all_relations:
-            db.session.add(relation)
+        return self.process_documents_batch([document_id]).get(document_id, [])
+    
+    def process_documents_batch(self, document_ids, batch_size=64, n_process=1):
+        """
+        Run the concept processing pipeline for several documents
+        
+        The texts go through spaCy together with nlp.pipe(), which batches
+        the model work instead of paying the per-call overhead for each
+        document. Returns a dict mapping each processed document id to its
+        saved concepts; documents that are missing or have no content are
+        left out.
+        """
+        documents = [
+            document for document in Document.query.filter(Document.id.in_(document_ids)).all()
+            if document.content
+        ]
+        if not documents:
+            return {}
+        
+        texts = [document.content for document in documents]
+        
+        # Only texts without a cached extraction or NLP result need spaCy
+        needs_nlp = [bool(self.nlp)] * len(texts)
+        if self.nlp and cache_available():
+            cache_keys = [self._extraction_cache_keys(text) for text in texts]
+            cached = cache.get_many(*(key for keys in cache_keys for key in keys))
+            needs_nlp = [
+                cached[2 * i] is None and cached[2 * i + 1] is None
+                for i in range(len(texts))
+            ]
+        # Large texts are split so no single parse holds a whole document
+        chunked = [_chunk_text(text) if parse else [] for text, parse in zip(texts, needs_nlp)]
+        parsed = self.nlp.pipe(
+            (chunk for chunks in chunked for _, chunk in chunks),
+            batch_size=batch_size, n_process=n_process
+        ) if any(needs_nlp) else iter(())
+        
+        results = {}
+        for document, text, parse, chunks in zip(documents, texts, needs_nlp, chunked):
+            # Extract concepts from document content
+            nlp_docs = [(offset, next(parsed)) for offset, _ in chunks] if parse else None
+            concepts = self.extract_concepts_from_text(text, document.id, nlp_docs=nlp_docs)
+            
+            # Save concepts to database
+            saved_concepts = self.save_concepts_to_db(concepts, document.id)
+            results[document.id] = saved_concepts
+            
+            # Find concept relations
+            index = self._build_similarity_index()
+            relations = []
+            for concept in saved_concepts:
+                relations.extend(self.find_concept_relations(concept.id, index=index))
+            
+            # Insert them before the next document so its duplicate checks see them
+            self.save_relations(relations)
         
         db.session.commit()
         
-        return saved_concepts
\ No newline at end of file
+        return results
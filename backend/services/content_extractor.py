@@ -1,10 +1,44 @@
 import re
+import hashlib
 import nltk
 import spacy
 from collections import Counter
+from functools import lru_cache
 import textstat
-from sentence_transformers import SentenceTransformer
 import numpy as np
+from backend.cache import cache, cache_available
+from backend.services.embeddings import load_embedding_model
+
+# Processing results are cached by content hash; bump the version whenever
+# the pipeline's output changes so stale results are not served
+CONTENT_CACHE_VERSION = 2
+CONTENT_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+
+WHITESPACE = re.compile(r'\s+')
+# Anything but word characters, whitespace and basic punctuation
+DISALLOWED_CHARACTERS = re.compile(r'[^\w\s\.\,\!\?\;\:\-\(\)]+')
+
+# Line patterns for structure detection, matched at the start of a line
+NUMBERED_LINE = re.compile(r'\d+\.')
+HEADING_LINE = re.compile(r'\d+\.|[A-Z][^.!?]*$')
+LIST_ITEM_LINE = re.compile(r'[\-\*\+]\s|\d+\.\s')
+
+@lru_cache(maxsize=1)
+def _load_stopwords():
+    """Read NLTK's English stop word list once per process"""
+    from nltk.corpus import stopwords
+    return frozenset(stopwords.words('english'))
+
+@lru_cache(maxsize=1)
+def _load_nlp():
+    """Load the spaCy model once per process; None when it is not installed"""
+    try:
+        # Only tokens, sentences (parser) and entities (ner) are read;
+        # neither of those components depends on the tagger
+        return spacy.load("en_core_web_sm", exclude=["tagger", "attribute_ruler", "lemmatizer"])
+    except OSError:
+        # If model not found, use basic tokenizer
+        return None
 
 class ContentExtractor:
     def __init__(self):
@@ -28,42 +62,44 @@ class ContentExtractor:
             nltk.data.find('taggers/averaged_perceptron_tagger')
         except LookupError:
             nltk.download('averaged_perceptron_tagger')
+        
+        self.stop_words = _load_stopwords()
     
     def setup_spacy(self):
         """Load spaCy model for NLP processing"""
-        try:
-            self.nlp = spacy.load("en_core_web_sm")
-        except OSError:
-            # If model not found, use basic tokenizer
-            self.nlp = None
+        self.nlp = _load_nlp()
+        self.nlp_version = f"{self.nlp.meta['name']}-{self.nlp.meta['version']}" if self.nlp else 'none'
     
     def setup_embeddings(self):
         """Load sentence transformer for embeddings"""
-        try:
-            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-        except:
-            self.embedding_model = None
+        self.embedding_model, self.embedding_version = load_embedding_model()
     
     def clean_text(self, text):
         """Clean and normalize text content"""
         if not text:
             return ""
         
-        # Remove extra whitespace and normalize line breaks
-        text = re.sub(r'\s+', ' ', text)
-        text = re.sub(r'\n+', '\n', text)
+        # Remove extra whitespace; this also turns line breaks into spaces
+        text = WHITESPACE.sub(' ', text)
         
         # Remove special characters but keep basic punctuation
-        text = re.sub(r'[^\w\s\.\,\!\?\;\:\-\(\)]', '', text)
+        text = DISALLOWED_CHARACTERS.sub('', text)
         
         return text.strip()
     
-    def extract_sentences(self, text):
-        """Extract sentences from text"""
+    def extract_sentences(self, text, doc=None):
+        """
+        Extract sentences from text
+        
+        doc is the text already parsed by spaCy; otherwise NLTK splits it.
+        """
         if not text:
             return []
         
-        sentences = nltk.sent_tokenize(text)
+        if doc is not None:
+            sentences = [sentence.text for sentence in doc.sents]
+        else:
+            sentences = nltk.sent_tokenize(text)
         return [s.strip() for s in sentences if len(s.strip()) > 10]
     
     def extract_keywords(self, text, max_keywords=20):
@@ -71,25 +107,60 @@ class ContentExtractor:
         if not text:
             return []
         
-        # Clean text and convert to lowercase
-        clean_text = self.clean_text(text.lower())
+        return self._rank_keywords(*self._count_keywords(text), max_keywords=max_keywords)
+    
+    def _count_keywords(self, text, doc=None):
+        """
+        Count the words and phrases keywords are ranked from
         
+        doc is the cleaned text already parsed by spaCy, whose tokens are
+        used instead of tokenizing again with NLTK.
+        """
         # Tokenize and remove stopwords
-        from nltk.corpus import stopwords
-        stop_words = set(stopwords.words('english'))
+        stop_words = self.stop_words
         
-        words = nltk.word_tokenize(clean_text)
+        if doc is not None:
+            words = [token.lower_ for token in doc]
+        else:
+            # Clean text and convert to lowercase
+            words = nltk.word_tokenize(self.clean_text(text.lower()))
         words = [word for word in words if word.isalpha() and len(word) > 2 and word not in stop_words]
         
         # Get word frequencies
         word_freq = Counter(words)
         
         # Extract phrases (bigrams and trigrams)
-        bigrams = [' '.join(bg) for bg in nltk.bigrams(words)]
-        trigrams = [' '.join(tg) for tg in nltk.trigrams(words)]
-        
-        phrase_freq = Counter(bigrams + trigrams)
+        phrase_freq = self._count_phrases(words)
         
+        return word_freq, phrase_freq
+    
+    def _count_phrases(self, words):
+        """
+        Count the bigrams and trigrams of words that occur more than once
+        
+        The n-grams are counted as rows of word ids, so strings are only built
+        for repeated phrases; phrases seen once never become keywords. They
+        are added bigrams first, each in order of first occurrence, which
+        keeps most_common() ties in the same order as counting every phrase.
+        """
+        phrase_freq = Counter()
+        if len(words) < 2:
+            return phrase_freq
+        
+        vocabulary, ids = np.unique(np.array(words), return_inverse=True)
+        for n in (2, 3):
+            if len(ids) < n:
+                break
+            windows = np.lib.stride_tricks.sliding_window_view(ids, n)
+            grams, first, counts = np.unique(windows, axis=0, return_index=True, return_counts=True)
+            repeated = np.flatnonzero(counts > 1)
+            for gram in repeated[np.argsort(first[repeated])]:
+                phrase_freq[' '.join(vocabulary[grams[gram]])] = int(counts[gram])
+        
+        return phrase_freq
+    
+    def _rank_keywords(self, word_freq, phrase_freq, max_keywords=20):
+        """Pick the top words and repeated phrases from their counts"""
         # Combine and rank keywords
         keywords = []
         
@@ -104,12 +175,17 @@ class ContentExtractor:
         
         return keywords[:max_keywords]
     
-    def extract_entities(self, text):
-        """Extract named entities using spaCy"""
+    def extract_entities(self, text, doc=None):
+        """
+        Extract named entities using spaCy
+        
+        doc is the text already parsed by spaCy, if any.
+        """
         if not self.nlp or not text:
             return []
         
-        doc = self.nlp(text)
+        if doc is None:
+            doc = self.nlp(text)
         entities = []
         
         for ent in doc.ents:
@@ -133,9 +209,14 @@ class ContentExtractor:
         
         return sorted(unique_entities, key=lambda x: x['frequency'], reverse=True)
     
-    def extract_topics(self, text, num_topics=5):
-        """Extract main topics from text using keyword clustering"""
-        keywords = self.extract_keywords(text, max_keywords=50)
+    def extract_topics(self, text, num_topics=5, keywords=None):
+        """
+        Extract main topics from text using keyword clustering
+        
+        keywords are the text's top 50 keywords when already extracted.
+        """
+        if keywords is None:
+            keywords = self.extract_keywords(text, max_keywords=50)
         
         if not keywords:
             return []
@@ -181,22 +262,37 @@ class ContentExtractor:
             'reading_time_minutes': textstat.reading_time(text, ms_per_char=14.69)
         }
     
-    def generate_embeddings(self, text):
-        """Generate sentence embeddings for semantic search"""
+    def generate_embeddings(self, text, sentences=None):
+        """
+        Generate sentence embeddings for semantic search
+        
+        sentences are the text's extract_sentences() result when already known.
+        """
         if not self.embedding_model or not text:
             return None
         
         try:
             # Split text into chunks for better embeddings
-            sentences = self.extract_sentences(text)
+            if sentences is None:
+                sentences = self.extract_sentences(text)
             if not sentences:
                 return None
             
-            # Generate embeddings for sentences
-            embeddings = self.embedding_model.encode(sentences)
+            # Generate embeddings for sentences; encode() sorts them by length
+            # before batching, so each batch is only padded to similar lengths
+            embeddings = self.embedding_model.encode(
+                sentences,
+                batch_size=64,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False
+            )
             
-            # Return average embedding for the document
-            return np.mean(embeddings, axis=0).tolist()
+            # Return the unit-length average embedding for the document, in full
+            # precision, so cosine similarity reduces to a dot product
+            document_embedding = np.mean(embeddings, axis=0, dtype=np.float32)
+            document_embedding /= np.sqrt(np.vdot(document_embedding, document_embedding)) + 1e-12
+            return document_embedding.tolist()
         except:
             return None
     
@@ -222,10 +318,7 @@ class ContentExtractor:
                 continue
             
             # Detect headings (simple heuristic)
-            if (len(line) < 100 and 
-                (line.isupper() or 
-                 re.match(r'^\d+\.', line) or
-                 re.match(r'^[A-Z][^.!?]*$', line))):
+            if len(line) < 100 and (line.isupper() or HEADING_LINE.match(line)):
                 
                 structure['headings'].append({
                     'text': line,
@@ -248,7 +341,7 @@ class ContentExtractor:
                 paragraph_count += 1
             
             # Detect lists
-            elif re.match(r'^[\-\*\+]\s', line) or re.match(r'^\d+\.\s', line):
+            elif LIST_ITEM_LINE.match(line):
                 structure['lists'] += 1
         
         if current_section:
@@ -261,7 +354,7 @@ class ContentExtractor:
         """Estimate heading level based on text characteristics"""
         if text.isupper():
             return 1
-        elif re.match(r'^\d+\.', text):
+        elif NUMBERED_LINE.match(text):
             return 2
         elif len(text) < 50:
             return 3
@@ -269,30 +362,58 @@ class ContentExtractor:
             return 4
     
     def process_document_content(self, text, title=None):
-        """Complete content processing pipeline"""
+        """
+        Complete content processing pipeline
+        
+        Results are cached by a hash of the text and the models used, so
+        processing the same content again, e.g. a re-uploaded file, is free.
+        """
         if not text:
             return {}
         
+        use_cache = cache_available()
+        if use_cache:
+            cache_key = self._content_cache_key(text)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
         # Clean the text
         cleaned_text = self.clean_text(text)
         
+        # Tokenize once; several features below share the results. With spaCy
+        # a single parse provides sentences, keyword tokens and entities.
+        doc = self.nlp(cleaned_text) if self.nlp and cleaned_text else None
+        sentences = self.extract_sentences(cleaned_text, doc=doc)
+        keyword_counts = self._count_keywords(cleaned_text, doc=doc)
+        keywords = self._rank_keywords(*keyword_counts)
+        topic_keywords = self._rank_keywords(*keyword_counts, max_keywords=50)
+        tokens = cleaned_text.split()
+        
         # Extract various content features
         result = {
             'cleaned_text': cleaned_text,
-            'sentences': self.extract_sentences(cleaned_text),
-            'keywords': self.extract_keywords(cleaned_text),
-            'entities': self.extract_entities(cleaned_text),
-            'topics': self.extract_topics(cleaned_text),
+            'sentences': sentences,
+            'keywords': keywords,
+            'entities': self.extract_entities(cleaned_text, doc=doc),
+            'topics': self.extract_topics(cleaned_text, keywords=topic_keywords),
             'readability': self.calculate_readability(cleaned_text),
             'structure': self.extract_structure(text),
-            'embeddings': self.generate_embeddings(cleaned_text),
+            'embeddings': self.generate_embeddings(cleaned_text, sentences=sentences),
             'statistics': {
                 'character_count': len(text),
-                'word_count': len(cleaned_text.split()),
-                'sentence_count': len(self.extract_sentences(cleaned_text)),
+                'word_count': len(tokens),
+                'sentence_count': len(sentences),
                 'paragraph_count': len([p for p in text.split('\n\n') if p.strip()]),
-                'unique_words': len(set(cleaned_text.lower().split()))
+                'unique_words': len(set(map(str.lower, tokens)))
             }
         }
         
-        return result
\ No newline at end of file
+        if use_cache:
+            cache.set(cache_key, result, timeout=CONTENT_CACHE_TIMEOUT)
+        return result
+    
+    def _content_cache_key(self, text):
+        """Cache key for the processing result of a text"""
+        digest = hashlib.blake2b(text.encode('utf-8'), digest_size=20).hexdigest()
+        return f'content:v{CONTENT_CACHE_VERSION}:{self.nlp_version}:{self.embedding_version}:{digest}'
\ No newline at end of file
@@ -1,23 +1,110 @@
 import os
 import PyPDF2
+import pypdfium2 as pdfium
 import docx
 import magic
 import hashlib
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
 from werkzeug.utils import secure_filename
 from backend.models.document import Document, db
 import json
 
+# PDFs with at least this many pages are split into page ranges that are
+# extracted in parallel; PDFium is not thread-safe, so workers are processes
+PDF_PARALLEL_MIN_PAGES = 16
+MAX_PDF_WORKERS = 4
+PDF_WORKERS = min(MAX_PDF_WORKERS, os.cpu_count() or 1)
+
+# Plain text files are read in blocks of this many characters
+TEXT_READ_CHUNK = 1024 * 1024
+
+# MIME types by leading file bytes. Office files are ZIP (Open XML) or OLE2
+# (legacy) containers, told apart by extension; anything else goes to libmagic.
+FILE_SIGNATURES = {
+    b'%PDF': 'application/pdf',
+    b'PK\x03\x04': {
+        'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+        'pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+        'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    },
+    b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1': {
+        'doc': 'application/msword',
+        'ppt': 'application/vnd.ms-powerpoint',
+        'xls': 'application/vnd.ms-excel',
+    },
+}
+
+_pdf_executor = None
+_pdf_executor_lock = threading.Lock()
+
+# Serializes PDFium calls made in this process; request threads share it
+_pdfium_lock = threading.Lock()
+
+def _get_pdf_executor():
+    """Get or create the process pool for PDF extraction"""
+    global _pdf_executor
+    if _pdf_executor is None:
+        with _pdf_executor_lock:
+            if _pdf_executor is None:
+                # Forking a multithreaded server can copy locks held by other
+                # threads into the child, so workers are spawned fresh
+                _pdf_executor = ProcessPoolExecutor(
+                    max_workers=PDF_WORKERS,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+    return _pdf_executor
+
+def _reset_pdf_executor(executor):
+    """Drop a broken process pool so the next extraction starts a new one"""
+    global _pdf_executor
+    with _pdf_executor_lock:
+        if _pdf_executor is executor:
+            _pdf_executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+def _read_pdf_pages(pdf, start, stop):
+    """Extract the text of pages start to stop of an open PDF"""
+    pages = []
+    for index in range(start, stop):
+        page = pdf[index]
+        text_page = page.get_textpage()
+        pages.append(text_page.get_text_range())
+        text_page.close()
+        page.close()
+    return pages
+
+def _extract_pdf_page_range(filepath, start, stop):
+    """Extract the text of pages start to stop of a PDF file in a worker process"""
+    pdf = pdfium.PdfDocument(filepath)
+    try:
+        return _read_pdf_pages(pdf, start, stop)
+    finally:
+        pdf.close()
+
 class DocumentProcessor:
     def extract_text_from_txt(self, filepath):
         """Extract text content from plain text file"""
         try:
+            # Words are counted per block instead of splitting the whole text
+            chunks = []
+            word_count = 0
+            in_word = False
             with open(filepath, 'r', encoding='utf-8') as file:
-                text = file.read()
+                for chunk in iter(lambda: file.read(TEXT_READ_CHUNK), ''):
+                    words = len(chunk.split())
+                    if in_word and not chunk[0].isspace():
+                        words -= 1  # Continues the word the last block ended in
+                    word_count += words
+                    in_word = not chunk[-1].isspace()
+                    chunks.append(chunk)
             return {
-                'content': text.strip(),
+                'content': ''.join(chunks).strip(),
                 'page_count': 1,
-                'word_count': len(text.split())
+                'word_count': word_count
             }
         except Exception as e:
             raise Exception(f"Error extracting text file content: {str(e)}")
@@ -34,7 +121,11 @@ class DocumentProcessor:
                filename.rsplit('.', 1)[1].lower() in self.allowed_extensions
     
     def get_file_type(self, filepath):
-        """Detect file type using python-magic"""
+        """Detect file type from its signature, using python-magic for the rest"""
+        mime = self._sniff_file_type(filepath)
+        if mime:
+            return mime
+        
         try:
             mime = magic.from_file(filepath, mime=True)
             return mime
@@ -47,10 +138,24 @@ class DocumentProcessor:
                 return 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
             return 'unknown'
     
+    def _sniff_file_type(self, filepath):
+        """Match the first bytes of a file against the known signatures"""
+        try:
+            with open(filepath, 'rb') as file:
+                head = file.read(16)
+        except OSError:
+            return None
+        
+        ext = filepath.rsplit('.', 1)[-1].lower()
+        for signature, mime in FILE_SIGNATURES.items():
+            if head.startswith(signature):
+                return mime.get(ext) if isinstance(mime, dict) else mime
+        return None
+    
     def generate_unique_filename(self, original_filename):
         """Generate unique filename using timestamp and hash"""
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        file_hash = hashlib.md5(original_filename.encode()).hexdigest()[:8]
+        file_hash = hashlib.blake2b(original_filename.encode(), digest_size=4).hexdigest()
         name, ext = os.path.splitext(original_filename)
         return f"{timestamp}_{file_hash}_{secure_filename(name)}{ext}"
     
@@ -80,38 +185,68 @@ class DocumentProcessor:
     def extract_text_from_pdf(self, filepath):
         """Extract text content from PDF file"""
         try:
-            with open(filepath, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                text = ""
-                page_count = len(pdf_reader.pages)
-                
-                for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
-                
-                return {
-                    'content': text.strip(),
-                    'page_count': page_count,
-                    'word_count': len(text.split())
-                }
+            try:
+                pages = self._extract_pdf_pages(filepath)
+            except Exception:
+                # Fall back to the pure-Python parser for files PDFium rejects
+                pages = self._extract_pdf_pages_pypdf2(filepath)
+            
+            text = "\n".join(pages)
+            return {
+                'content': text.strip(),
+                'page_count': len(pages),
+                'word_count': len(text.split())
+            }
         except Exception as e:
             raise Exception(f"Error extracting PDF content: {str(e)}")
     
+    def _extract_pdf_pages(self, filepath):
+        """Extract the text of each PDF page with PDFium"""
+        with _pdfium_lock:
+            pdf = pdfium.PdfDocument(filepath)
+            try:
+                page_count = len(pdf)
+                if page_count < PDF_PARALLEL_MIN_PAGES or PDF_WORKERS < 2:
+                    return _read_pdf_pages(pdf, 0, page_count)
+            finally:
+                pdf.close()
+        
+        # One contiguous range per worker, so each opens the file only once
+        step = -(-page_count // PDF_WORKERS)
+        starts = list(range(0, page_count, step))
+        stops = [min(start + step, page_count) for start in starts]
+        
+        executor = _get_pdf_executor()
+        pages = []
+        try:
+            for part in executor.map(_extract_pdf_page_range, [filepath] * len(starts), starts, stops):
+                pages.extend(part)
+        except BrokenProcessPool:
+            # A worker died (e.g. PDFium crashed on this file); the pool is
+            # unusable from now on, so replace it and let the caller fall back
+            _reset_pdf_executor(executor)
+            raise
+        return pages
+    
+    def _extract_pdf_pages_pypdf2(self, filepath):
+        """Extract the text of each PDF page with PyPDF2"""
+        with open(filepath, 'rb') as file:
+            pdf_reader = PyPDF2.PdfReader(file)
+            return [page.extract_text() for page in pdf_reader.pages]
+    
     def extract_text_from_docx(self, filepath):
         """Extract text content from Word document"""
         try:
             doc = docx.Document(filepath)
-            text = ""
+            # Collected as lines and joined once; appending to a string copies it
+            lines = [paragraph.text for paragraph in doc.paragraphs]
             
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-            
-            # Extract text from tables
+            # Extract text from tables, one line per row
             for table in doc.tables:
                 for row in table.rows:
-                    for cell in row.cells:
-                        text += cell.text + " "
-                    text += "\n"
+                    lines.append(''.join(cell.text + " " for cell in row.cells))
             
+            text = "\n".join(lines)
             return {
                 'content': text.strip(),
                 'page_count': 1,  # Word docs don't have clear page breaks in python-docx
@@ -158,14 +293,23 @@ class DocumentProcessor:
         # Fallback to filename without extension
         return os.path.splitext(filename)[0].replace('_', ' ').title()
     
-    def generate_summary(self, content, max_length=500):
-        """Generate document summary from content"""
+    def generate_summary(self, content, sentences=None, max_length=500):
+        """
+        Generate document summary from content
+        
+        sentences are the content's tokenized sentences when already known,
+        e.g. from ContentExtractor.extract_sentences(); otherwise the content
+        is cut at periods.
+        """
         if not content:
             return ""
         
         # Simple extractive summary - take first few sentences
-        sentences = content.split('.')[:3]
-        summary = '. '.join(sentences).strip()
+        if sentences is not None:
+            summary = ' '.join(sentences[:3]).strip()
+        else:
+            # Only the first three pieces are split off, not the whole text
+            summary = '. '.join(content.split('.', 3)[:3]).strip()
         
         if len(summary) > max_length:
             summary = summary[:max_length] + "..."
@@ -178,7 +322,8 @@ class DocumentProcessor:
             # Save uploaded file
             file_info = self.save_uploaded_file(file)
             
-            # Create document record
+            # Create document record; it is committed once, together with the
+            # extraction results, instead of first as a 'processing' row
             document = Document(
                 filename=file_info['filename'],
                 original_filename=file_info['original_filename'],
@@ -188,7 +333,6 @@ class DocumentProcessor:
             )
             
             db.session.add(document)
-            db.session.commit()
             
             try:
                 # Extract content
@@ -207,6 +351,9 @@ class DocumentProcessor:
                 document.processed_date = datetime.utcnow()
                 document.processing_status = 'completed'
                 
+                # Flush to get the document id used in the processed file name
+                db.session.flush()
+                
                 # Save processed content to file
                 processed_filepath = os.path.join(
                     self.processed_folder, 
@@ -0,0 +1,85 @@
+import os
+import platform
+import torch
+from functools import lru_cache
+from sentence_transformers import SentenceTransformer
+
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+
+# Encoding stops scaling past a handful of cores and starves the request threads
+MAX_TORCH_THREADS = 8
+
+def _select_device():
+    """Pick the fastest available device for the sentence transformer"""
+    if torch.cuda.is_available():
+        return 'cuda'
+    mps = getattr(torch.backends, 'mps', None)
+    if mps is not None and mps.is_available():
+        return 'mps'
+    return 'cpu'
+
+def _configure_cpu_threads():
+    """Size PyTorch's CPU thread pools for encoding"""
+    torch.set_num_threads(min(MAX_TORCH_THREADS, os.cpu_count() or 4))
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # Can only be set before the first parallel operation in the process
+
+def _onnx_file_names(device):
+    """ONNX exports of the model to try on this device, fastest first"""
+    if device == 'cuda':
+        return ['model_O4.onnx']  # O3 graph optimizations with fp16 weights
+    names = []
+    if platform.machine().lower() in ('x86_64', 'amd64'):
+        names.append('model_quint8_avx2.onnx')  # Dynamic int8 quantization
+    names.append('model_O3.onnx')
+    return names
+
+@lru_cache(maxsize=1)
+def load_embedding_model():
+    """
+    Load the sentence transformer once per process
+
+    Returns the model and a version string for cache keys; the model is
+    None when it cannot be loaded. The content extractor and the search
+    engine share the instance.
+    """
+    device = _select_device()
+    if device == 'cpu':
+        _configure_cpu_threads()
+
+    model = None
+    for file_name in _onnx_file_names(device):
+        try:
+            # ONNX Runtime graph with fused attention and LayerNorm kernels;
+            # needs sentence-transformers 3.2+ with optimum[onnxruntime]
+            model = SentenceTransformer(
+                EMBEDDING_MODEL_NAME,
+                device=device,
+                backend='onnx',
+                model_kwargs={'file_name': file_name}
+            )
+            version = f'{EMBEDDING_MODEL_NAME}-onnx-{os.path.splitext(file_name)[0]}'
+            break
+        except Exception:
+            continue
+
+    if model is None:
+        try:
+            model = SentenceTransformer(EMBEDDING_MODEL_NAME, device=device)
+            # Half precision halves the memory traffic and uses tensor cores on GPUs
+            if device == 'cuda':
+                model.half()
+            version = EMBEDDING_MODEL_NAME
+        except:
+            return None, 'none'
+
+    # The first encode initializes kernels and allocators; pay for it at startup
+    # rather than on the first search
+    try:
+        model.encode(['warmup'], show_progress_bar=False)
+    except Exception:
+        pass
+
+    return model, version
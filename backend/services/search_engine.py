@@ -1,63 +1,322 @@
+import os
 import re
+import hashlib
+import tempfile
+import joblib
 import numpy as np
-from collections import defaultdict
+import sklearn
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from functools import lru_cache
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from sentence_transformers import SentenceTransformer
 from backend.models.document import Document, Concept, db, document_concepts
-from sqlalchemy import func, or_, and_
+from backend.models.search_indexes import concept_prefix_filter, document_text_filter, document_title_filter
+from backend.services.embeddings import load_embedding_model
+from sqlalchemy import func, literal, null, or_, select, union_all
+
+try:
+    import faiss
+except ImportError:  # faiss-cpu is optional; semantic search then scans every embedding
+    faiss = None
+
+# Rows fetched per round trip while reading the corpus
+BUILD_BATCH_SIZE = 500
+
+# Built indexes are saved under a signature of the indexed documents; bump the
+# version whenever the index contents or vectorizer settings change
+SEARCH_INDEX_VERSION = 1
+
+# Recent query embeddings kept per engine; a rebuilt engine starts empty
+QUERY_EMBEDDING_CACHE_SIZE = 512
+
+# Below this many documents an exact scan is fast enough and never misses a match
+ANN_MIN_DOCUMENTS = 5000
+HNSW_NEIGHBORS = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 128
+# The index stores 8-bit codes; this many times k candidates are re-scored with the float32 rows
+ANN_RERANK_FACTOR = 2
+
+# Weight of each search method in a hybrid score, and the bonus per method that found a document
+SEARCH_TYPE_WEIGHTS = {
+    'keyword': 0.4,
+    'semantic': 0.4,
+    'concept': 0.2
+}
+DEFAULT_SEARCH_TYPE_WEIGHT = 0.3
+METHOD_BONUS = 0.1
+
+# Hybrid sub-searches run side by side, overlapping database waits with query encoding
+_hybrid_search_executor = ThreadPoolExecutor(max_workers=8)
+
+def _run_in_app_context(app, search, *args):
+    """Run a sub-search in a worker thread, which needs its own app context and session"""
+    with app.app_context():
+        return search(*args)
+
+@lru_cache(maxsize=256)
+def _highlight_pattern(terms):
+    """Compile one case-insensitive pattern matching any of the terms, preferring the longest"""
+    alternatives = sorted(terms, key=len, reverse=True)
+    return re.compile('|'.join(re.escape(term) for term in alternatives), re.IGNORECASE)
+
+def _write_atomically(path, write):
+    """Write a file through a temporary sibling so no reader sees it half written"""
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    os.close(fd)
+    try:
+        write(temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+def _mark(match):
+    return f"<mark>{match.group()}</mark>"
 
 class SearchEngine:
-    def __init__(self):
+    def __init__(self, index_folder='search_index'):
+        self.index_folder = index_folder
         self.setup_embeddings()
         self.tfidf_vectorizer = None
         self.tfidf_matrix = None
-        self.document_embeddings = {}
+        self.doc_id_to_row = {}
+        self.embedding_matrix = None  # One unit-length row per document in embedding_doc_ids, as in doc_id_to_row
+        self.embedding_doc_ids = []
+        self.ann_index = None
+        self._query_embedding = lru_cache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)(self._encode_query)
         self.build_search_index()
     
     def setup_embeddings(self):
         """Setup sentence transformer for semantic search"""
-        try:
-            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-        except:
-            self.embedding_model = None
+        # Loaded once per process, so rebuilding the engine does not reload it
+        self.embedding_model, self.embedding_version = load_embedding_model()
+    
+    def _indexed_documents(self, *columns):
+        """Stream the given columns of every document that belongs in the index, by ID"""
+        return db.session.execute(
+            select(Document.id, Document.processed_date, *columns)
+            .where(
+                Document.processing_status == 'completed',
+                Document.content.isnot(None),
+                Document.content != ''
+            )
+            .order_by(Document.id)
+            .execution_options(stream_results=True, yield_per=BUILD_BATCH_SIZE)
+        )
+    
+    def _index_signature(self):
+        """Start a hash identifying an index built from a set of documents with these settings"""
+        signature = hashlib.blake2b(digest_size=16)
+        signature.update(f'{SEARCH_INDEX_VERSION}:{sklearn.__version__}:{self.embedding_version}'.encode())
+        return signature
     
     def build_search_index(self):
-        """Build search indexes for documents"""
-        documents = Document.query.filter(Document.processing_status == 'completed').all()
-        
-        if not documents:
+        """Build search indexes for documents, or load them if this corpus was indexed before"""
+        # Documents never change once processed, so their IDs and processing
+        # times identify the corpus without reading any content
+        signature = self._index_signature()
+        indexed = False
+        for doc_id, processed_date in self._indexed_documents():
+            signature.update(f'{doc_id}:{processed_date}\n'.encode())
+            indexed = True
+        
+        if not indexed:
+            return
+        if self._load_index(signature.hexdigest()):
             return
         
-        # Build TF-IDF index
-        corpus = []
-        doc_ids = []
+        # Stream only the IDs and text; full Document objects would keep every
+        # content blob alive in the session's identity map
+        rows = self._indexed_documents(Document.content)
+        signature = self._index_signature()
         
-        for doc in documents:
-            if doc.content:
-                corpus.append(doc.content)
-                doc_ids.append(doc.id)
-        
-        if corpus:
-            self.tfidf_vectorizer = TfidfVectorizer(
-                max_features=5000,
-                ngram_range=(1, 2),
-                stop_words='english',
-                min_df=1,
-                max_df=0.8
-            )
-            self.tfidf_matrix = self.tfidf_vectorizer.fit_transform(corpus)
-            self.doc_ids = doc_ids
+        doc_ids = []
+        heads = []  # The start of each document, which is all that gets embedded
+        
+        def corpus():
+            for doc_id, processed_date, content in rows:
+                signature.update(f'{doc_id}:{processed_date}\n'.encode())
+                doc_ids.append(doc_id)
+                heads.append(content[:1000])  # Limit text length
+                yield content
+        
+        # Build TF-IDF index in the same pass that collects the IDs
+        self.tfidf_vectorizer = TfidfVectorizer(
+            max_features=5000,
+            ngram_range=(1, 2),
+            stop_words='english',
+            min_df=1,
+            max_df=0.8
+        )
+        documents = corpus()
+        try:
+            self.tfidf_matrix = self.tfidf_vectorizer.fit_transform(documents)
+        except ValueError as e:
+            # No term survives the document frequency limits, e.g. with a single
+            # document or only stop words; keyword search falls back to simple relevance
+            print(f"TF-IDF index build error: {e}")
+            self.tfidf_vectorizer = None
+            self.tfidf_matrix = None
+            for _ in documents:  # Still collect every ID and head for the embeddings
+                pass
+        self.doc_ids = doc_ids
+        self.doc_id_to_row = {doc_id: row for row, doc_id in enumerate(doc_ids)}
         
         # Build semantic embeddings index
         if self.embedding_model:
-            for doc in documents:
-                if doc.content:
-                    try:
-                        embedding = self.embedding_model.encode(doc.content[:1000])  # Limit text length
-                        self.document_embeddings[doc.id] = embedding
-                    except:
-                        continue
+            try:
+                # One call lets encode() sort every text by length and batch them
+                embeddings = self.embedding_model.encode(
+                    heads,
+                    batch_size=64,
+                    convert_to_numpy=True,
+                    normalize_embeddings=True,
+                    show_progress_bar=False
+                )
+            except:
+                embeddings = None
+            
+            if embeddings is not None:
+                self.embedding_matrix = np.asarray(embeddings, dtype=np.float32)
+                self.embedding_doc_ids = doc_ids
+                self.ann_index = self._build_ann_index()
+        
+        # Keep a failed encode from being saved as the index for this corpus
+        if not self.embedding_model or self.embedding_matrix is not None:
+            self._save_index(signature.hexdigest())
+    
+    def _index_paths(self, signature):
+        """Files holding the saved index for a corpus signature"""
+        base = os.path.join(self.index_folder, signature)
+        return {
+            'tfidf': f'{base}.tfidf.joblib',
+            'embeddings': f'{base}.embeddings.npy',
+            'ann': f'{base}.hnsw.faiss'
+        }
+    
+    def _load_index(self, signature):
+        """Load a saved index for this corpus signature; False when there is none"""
+        paths = self._index_paths(signature)
+        if not os.path.exists(paths['tfidf']):
+            return False
+        
+        try:
+            saved = joblib.load(paths['tfidf'])
+            doc_ids = saved['doc_ids']
+            
+            embedding_matrix = ann_index = None
+            if self.embedding_model:
+                # Memory-mapped, so only the pages searches touch are read into RAM
+                embedding_matrix = np.load(paths['embeddings'], mmap_mode='r')
+                if faiss is not None and os.path.exists(paths['ann']):
+                    ann_index = faiss.read_index(paths['ann'])
+        except Exception as e:
+            print(f"Search index load error: {e}")
+            return False
+        
+        self.tfidf_vectorizer = saved['vectorizer']
+        self.tfidf_matrix = saved['tfidf_matrix']
+        self.doc_ids = doc_ids
+        self.doc_id_to_row = {doc_id: row for row, doc_id in enumerate(doc_ids)}
+        
+        if embedding_matrix is not None:
+            self.embedding_matrix = embedding_matrix
+            self.embedding_doc_ids = doc_ids
+            self.ann_index = ann_index if ann_index is not None else self._build_ann_index()
+        
+        return True
+    
+    def _save_index(self, signature):
+        """Save the built index under its corpus signature, replacing older ones"""
+        paths = self._index_paths(signature)
+        
+        def save_embeddings(path):
+            with open(path, 'wb') as f:
+                np.save(f, self.embedding_matrix)
+        
+        try:
+            os.makedirs(self.index_folder, exist_ok=True)
+            # The TF-IDF file is written last; its presence marks a complete index
+            if self.embedding_matrix is not None:
+                _write_atomically(paths['embeddings'], save_embeddings)
+            if self.ann_index is not None:
+                _write_atomically(paths['ann'], lambda path: faiss.write_index(self.ann_index, path))
+            _write_atomically(paths['tfidf'], lambda path: joblib.dump({
+                'vectorizer': self.tfidf_vectorizer,
+                'tfidf_matrix': self.tfidf_matrix,
+                'doc_ids': self.doc_ids
+            }, path))
+        except Exception as e:
+            print(f"Search index save error: {e}")
+            return
+        
+        # Indexes of earlier corpora will not be loaded again
+        current = {os.path.basename(path) for path in paths.values()}
+        for name in os.listdir(self.index_folder):
+            if name not in current and not name.endswith('.tmp'):  # Other writers' files in progress
+                try:
+                    os.remove(os.path.join(self.index_folder, name))
+                except OSError:
+                    pass  # Still open in another process
+    
+    def _build_ann_index(self):
+        """Build an HNSW graph over 8-bit quantized embeddings for approximate nearest neighbour search"""
+        if faiss is None or len(self.embedding_doc_ids) < ANN_MIN_DOCUMENTS:
+            return None
+        
+        try:
+            # Rows are unit length, so inner product ranks by cosine similarity
+            index = faiss.IndexHNSWSQ(
+                self.embedding_matrix.shape[1], faiss.ScalarQuantizer.QT_8bit,
+                HNSW_NEIGHBORS, faiss.METRIC_INNER_PRODUCT
+            )
+            index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+            index.hnsw.efSearch = HNSW_EF_SEARCH
+            index.train(self.embedding_matrix)  # Fits the per-dimension ranges of the quantizer
+            index.add(self.embedding_matrix)
+        except Exception as e:
+            print(f"ANN index error: {e}")
+            return None
+        
+        return index
+    
+    def _nearest_documents(self, query_matrix, k):
+        """
+        Find the k documents most similar to each query embedding
+        
+        Returns one list of (document ID, similarity) pairs per query row, best first.
+        """
+        k = min(k, len(self.embedding_doc_ids))
+        if k <= 0:
+            return [[] for _ in query_matrix]
+        
+        query_matrix = np.ascontiguousarray(query_matrix, dtype=np.float32)
+        # All rows are unit length, so the products are the cosine similarities
+        if self.ann_index is not None:
+            # Quantized distances only pick the candidates; their exact scores decide the order
+            _, candidate_rows = self.ann_index.search(
+                query_matrix, min(k * ANN_RERANK_FACTOR, len(self.embedding_doc_ids))
+            )
+            candidate_similarities = np.einsum('qd,qkd->qk', query_matrix, self.embedding_matrix[candidate_rows])
+            candidate_similarities[candidate_rows < 0] = -np.inf  # Padding for missing neighbours
+        else:
+            candidate_similarities = query_matrix @ self.embedding_matrix.T
+            candidate_rows = None
+        
+        # Only the top k of each row get sorted
+        top = np.argpartition(-candidate_similarities, k - 1, axis=1)[:, :k]
+        similarities = np.take_along_axis(candidate_similarities, top, axis=1)
+        order = np.argsort(-similarities, axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        similarities = np.take_along_axis(similarities, order, axis=1)
+        rows = top if candidate_rows is None else np.take_along_axis(candidate_rows, top, axis=1)
+        
+        doc_ids = self.embedding_doc_ids
+        return [
+            [(doc_ids[row], float(similarity)) for row, similarity in zip(row_ids, row_similarities) if row >= 0]
+            for row_ids, row_similarities in zip(rows, similarities)
+        ]
     
     def search_documents(self, query, search_type='hybrid', filters=None, limit=20):
         """
@@ -72,25 +331,94 @@ class SearchEngine:
         if not query.strip():
             return []
         
-        results = []
+        searches = []
         
         if search_type in ['keyword', 'hybrid']:
-            keyword_results = self._keyword_search(query, filters, limit)
-            results.extend(keyword_results)
+            searches.append(self._keyword_search)
         
         if search_type in ['semantic', 'hybrid'] and self.embedding_model:
-            semantic_results = self._semantic_search(query, filters, limit)
-            results.extend(semantic_results)
+            searches.append(self._semantic_search)
         
         if search_type in ['concept', 'hybrid']:
-            concept_results = self._concept_search(query, filters, limit)
-            results.extend(concept_results)
+            searches.append(self._concept_search)
+        
+        # The first search runs here while the others run in the pool; results
+        # are still collected in a fixed order so ties merge the same way
+        app = current_app._get_current_object()
+        futures = [
+            _hybrid_search_executor.submit(_run_in_app_context, app, search, query, filters, limit)
+            for search in searches[1:]
+        ]
+        results = []
+        for search in searches[:1]:
+            results.extend(search(query, filters, limit))
+        for future in futures:
+            results.extend(future.result())
         
         # Merge and rank results
-        merged_results = self._merge_search_results(results, search_type)
+        merged_results = self._merge_search_results(results, search_type, limit)
         
         return merged_results[:limit]
     
+    def search_documents_batch(self, queries, filters=None, limit=20, exclude_ids=None):
+        """
+        Semantic search for several queries at once
+        
+        Args:
+            queries: List of search query strings
+            filters: Dictionary of filters applied to every query
+            limit: Maximum number of results per query
+            exclude_ids: Optional list with one document ID per query to leave out of its results
+        
+        Returns one result list per query, in the same order as `queries`.
+        """
+        if not queries:
+            return []
+        
+        if not self.embedding_model or self.embedding_matrix is None:
+            return [[] for _ in queries]
+        
+        exclude_ids = exclude_ids or [None] * len(queries)
+        
+        # Encode all queries together and look up their neighbours in one call;
+        # one extra neighbour leaves room for the excluded document
+        query_matrix = self.embedding_model.encode(queries, convert_to_numpy=True, normalize_embeddings=True)
+        
+        candidates = []
+        for neighbours, exclude_id in zip(self._nearest_documents(query_matrix, limit * 2 + 1), exclude_ids):
+            ranked = [
+                (doc_id, similarity) for doc_id, similarity in neighbours
+                if similarity > 0.1 and doc_id != exclude_id
+            ]
+            candidates.append(ranked[:limit * 2])
+        
+        # Load every candidate document with a single query
+        candidate_ids = {doc_id for ranked in candidates for doc_id, _ in ranked}
+        if not candidate_ids:
+            return [[] for _ in queries]
+        
+        db_query = Document.query.filter(Document.id.in_(candidate_ids))
+        if filters:
+            db_query = self._apply_filters(db_query, filters)
+        documents = {doc.id: doc for doc in db_query.all()}
+        
+        # Semantic matches are highlighted where the query terms occur
+        batch_results = []
+        for query, ranked in zip(queries, candidates):
+            results = [
+                {
+                    'document': documents[doc_id],
+                    'score': float(similarity),
+                    'search_type': 'semantic',
+                    'highlights': self._extract_highlights(documents[doc_id], query)
+                }
+                for doc_id, similarity in ranked
+                if doc_id in documents
+            ]
+            batch_results.append(results[:limit])
+        
+        return batch_results
+    
     def _keyword_search(self, query, filters=None, limit=20):
         """Perform keyword-based search using TF-IDF"""
         results = []
@@ -102,92 +430,70 @@ class SearchEngine:
         if filters:
             db_query = self._apply_filters(db_query, filters)
         
-        # Search in title, content, and summary
+        # Search in title, content, and summary, through the text index when there is one
         search_terms = query.lower().split()
-        conditions = []
-        
-        for term in search_terms:
-            term_conditions = [
-                Document.title.ilike(f'%{term}%'),
-                Document.content.ilike(f'%{term}%'),
-                Document.summary.ilike(f'%{term}%')
-            ]
-            conditions.append(or_(*term_conditions))
-        
-        if conditions:
-            db_query = db_query.filter(and_(*conditions))
+        if search_terms:
+            db_query = db_query.filter(document_text_filter(search_terms))
         
-        documents = db_query.limit(limit * 2).all()  # Get more for ranking
+        # Get more for ranking, but only their IDs; full rows are loaded for the ones that rank
+        candidate_ids = [doc_id for doc_id, in db_query.with_entities(Document.id).limit(limit * 2)]
+        if not candidate_ids:
+            return results
         
         # Rank using TF-IDF if available
+        scores = None
         if self.tfidf_vectorizer and self.tfidf_matrix is not None:
             try:
+                # TF-IDF rows and the query vector are L2-normalized, so the
+                # sparse dot products of the candidates' rows are their cosine similarities
                 query_vector = self.tfidf_vectorizer.transform([query])
-                similarities = cosine_similarity(query_vector, self.tfidf_matrix).flatten()
-                
-                # Create document similarity mapping
-                doc_similarities = {}
-                for i, doc_id in enumerate(self.doc_ids):
-                    doc_similarities[doc_id] = similarities[i]
-                
-                # Rank documents by similarity
-                for doc in documents:
-                    similarity = doc_similarities.get(doc.id, 0.0)
-                    if similarity > 0.01:  # Minimum threshold
-                        results.append({
-                            'document': doc,
-                            'score': similarity,
-                            'search_type': 'keyword',
-                            'highlights': self._extract_highlights(doc, query)
-                        })
+                indexed_ids = [doc_id for doc_id in candidate_ids if doc_id in self.doc_id_to_row]
+                rows = [self.doc_id_to_row[doc_id] for doc_id in indexed_ids]
+                similarities = (self.tfidf_matrix[rows] @ query_vector.T).toarray().ravel()
+                scores = {
+                    doc_id: similarity
+                    for doc_id, similarity in zip(indexed_ids, similarities)
+                    if similarity > 0.01  # Minimum threshold
+                }
             except:
-                # Fallback to simple ranking
-                for doc in documents:
-                    score = self._calculate_simple_relevance(doc, query)
-                    results.append({
-                        'document': doc,
-                        'score': score,
-                        'search_type': 'keyword',
-                        'highlights': self._extract_highlights(doc, query)
-                    })
+                scores = None  # Fallback to simple ranking
+        
+        if scores is not None:
+            documents = Document.query.filter(Document.id.in_(list(scores))).all() if scores else []
         else:
+            documents = Document.query.filter(Document.id.in_(candidate_ids)).all()
             # Simple relevance scoring
-            for doc in documents:
-                score = self._calculate_simple_relevance(doc, query)
-                results.append({
-                    'document': doc,
-                    'score': score,
-                    'search_type': 'keyword',
-                    'highlights': self._extract_highlights(doc, query)
-                })
+            scores = {doc.id: self._calculate_simple_relevance(doc, search_terms) for doc in documents}
+        
+        for doc in documents:
+            results.append({
+                'document': doc,
+                'score': scores[doc.id],
+                'search_type': 'keyword',
+                'highlights': self._extract_highlights(doc, query)
+            })
         
         return sorted(results, key=lambda x: x['score'], reverse=True)
     
     def _semantic_search(self, query, filters=None, limit=20):
         """Perform semantic search using sentence embeddings"""
-        if not self.embedding_model or not self.document_embeddings:
+        if not self.embedding_model or self.embedding_matrix is None:
             return []
         
         results = []
         
         try:
-            # Generate query embedding
-            query_embedding = self.embedding_model.encode(query)
-            
-            # Calculate similarities with all documents
-            similarities = []
-            for doc_id, doc_embedding in self.document_embeddings.items():
-                similarity = cosine_similarity(
-                    query_embedding.reshape(1, -1),
-                    doc_embedding.reshape(1, -1)
-                )[0][0]
-                similarities.append((doc_id, similarity))
+            # Generate query embedding, reused for repeated queries
+            query_embedding = self._query_embedding(query)
             
-            # Sort by similarity
-            similarities.sort(key=lambda x: x[1], reverse=True)
-            
-            # Get top documents
-            top_doc_ids = [doc_id for doc_id, sim in similarities[:limit * 2] if sim > 0.1]
+            # Get the most similar documents from the index
+            neighbours = self._nearest_documents(query_embedding[np.newaxis, :], limit * 2)[0]
+            doc_similarities = {
+                doc_id: similarity
+                for doc_id, similarity in neighbours
+                if similarity > 0.1
+            }
+            top_doc_ids = list(doc_similarities)
             
             if top_doc_ids:
                 db_query = Document.query.filter(Document.id.in_(top_doc_ids))
@@ -198,15 +504,14 @@ class SearchEngine:
                 
                 documents = db_query.all()
                 
-                # Create results with similarity scores
-                doc_similarities = dict(similarities)
+                # Create results with similarity scores, highlighted where the query terms occur
                 for doc in documents:
                     similarity = doc_similarities.get(doc.id, 0.0)
                     results.append({
                         'document': doc,
                         'score': similarity,
                         'search_type': 'semantic',
-                        'highlights': self._extract_semantic_highlights(doc, query)
+                        'highlights': self._extract_highlights(doc, query)
                     })
         
         except Exception as e:
@@ -214,56 +519,64 @@ class SearchEngine:
         
         return sorted(results, key=lambda x: x['score'], reverse=True)
     
+    def _encode_query(self, query):
+        """Encode a search query as a read-only unit-length float32 vector"""
+        embedding = np.asarray(self.embedding_model.encode(query, normalize_embeddings=True), dtype=np.float32)
+        embedding.flags.writeable = False  # Shared by every later search for the same query
+        return embedding
+    
     def _concept_search(self, query, filters=None, limit=20):
         """Search documents based on concepts"""
         results = []
         
-        # Find concepts matching the query
-        concept_query = Concept.query.filter(
-            or_(
-                Concept.name.ilike(f'%{query}%'),
-                Concept.description.ilike(f'%{query}%')
+        # Find concepts matching the query; highlights only need their names
+        matched_concepts = db.session.execute(
+            select(Concept.id, Concept.name).where(
+                or_(
+                    Concept.name.ilike(f'%{query}%'),
+                    Concept.description.ilike(f'%{query}%')
+                )
             )
         ).all()
         
-        if not concept_query:
+        if not matched_concepts:
             return results
         
-        concept_ids = [c.id for c in concept_query]
+        concept_ids = [concept.id for concept in matched_concepts]
         
-        # Find documents containing these concepts
-        doc_concept_query = db.session.query(
-            Document,
+        # Aggregate the matches per document on the link table alone, then join
+        # the documents to it so they arrive in the same round trip
+        matches = select(
+            document_concepts.c.document_id,
             func.count(document_concepts.c.concept_id).label('concept_matches'),
             func.avg(document_concepts.c.relevance_score).label('avg_relevance')
+        ).where(
+            document_concepts.c.concept_id.in_(concept_ids)
+        ).group_by(document_concepts.c.document_id).cte('concept_matches')
+        
+        doc_concept_query = db.session.query(
+            Document, matches.c.concept_matches, matches.c.avg_relevance
         ).join(
-            document_concepts, Document.id == document_concepts.c.document_id
+            matches, Document.id == matches.c.document_id
         ).filter(
-            document_concepts.c.concept_id.in_(concept_ids),
             Document.processing_status == 'completed'
-        ).group_by(Document.id)
+        )
         
         # Apply filters
         if filters:
             doc_concept_query = self._apply_filters(doc_concept_query, filters)
         
-        documents = doc_concept_query.order_by(
-            func.count(document_concepts.c.concept_id).desc()
-        ).limit(limit).all()
+        documents = doc_concept_query.order_by(matches.c.concept_matches.desc()).limit(limit).all()
         
-        for doc_result in documents:
-            doc = doc_result[0] if isinstance(doc_result, tuple) else doc_result
-            concept_matches = doc_result[1] if isinstance(doc_result, tuple) else 1
-            avg_relevance = doc_result[2] if isinstance(doc_result, tuple) else 0.5
-            
+        for doc, concept_matches, avg_relevance in documents:
             # Calculate concept-based score
-            score = (concept_matches * avg_relevance) / len(concept_ids)
+            score = (concept_matches * (avg_relevance or 0.0)) / len(concept_ids)
             
             results.append({
                 'document': doc,
                 'score': score,
                 'search_type': 'concept',
-                'highlights': self._extract_concept_highlights(doc, concept_query),
+                'highlights': self._extract_concept_highlights(doc, matched_concepts),
                 'matched_concepts': concept_matches
             })
         
@@ -286,9 +599,10 @@ class SearchEngine:
         
         if 'concepts' in filters and filters['concepts']:
             concept_ids = filters['concepts']
-            query = query.join(
-                document_concepts, Document.id == document_concepts.c.document_id
-            ).filter(document_concepts.c.concept_id.in_(concept_ids))
+            # A semi-join keeps one row per document however many of the concepts it has
+            query = query.filter(Document.id.in_(
+                select(document_concepts.c.document_id).where(document_concepts.c.concept_id.in_(concept_ids))
+            ))
         
         if 'min_word_count' in filters:
             query = query.filter(Document.word_count >= filters['min_word_count'])
@@ -298,57 +612,55 @@ class SearchEngine:
         
         return query
     
-    def _merge_search_results(self, results, search_type):
+    def _merge_search_results(self, results, search_type, limit=None):
         """Merge and rank results from different search methods"""
-        if search_type != 'hybrid':
+        if search_type != 'hybrid' or not results:
             return results
         
-        # Group results by document ID
-        doc_results = defaultdict(list)
-        for result in results:
-            doc_id = result['document'].id
-            doc_results[doc_id].append(result)
+        # Flatten the results into parallel arrays, then group them by document ID
+        doc_ids = np.fromiter((result['document'].id for result in results), dtype=np.int64, count=len(results))
+        scores = np.fromiter((result['score'] for result in results), dtype=np.float64, count=len(results))
+        type_codes = {}
+        types = np.fromiter(
+            (type_codes.setdefault(result['search_type'], len(type_codes)) for result in results),
+            dtype=np.int64, count=len(results)
+        )
+        weights = np.array([
+            SEARCH_TYPE_WEIGHTS.get(name, DEFAULT_SEARCH_TYPE_WEIGHT) for name in type_codes
+        ])[types]
+        
+        unique_ids, first_rows, groups = np.unique(doc_ids, return_index=True, return_inverse=True)
+        counts = np.bincount(groups)
+        
+        # Documents found by several methods get the weighted sum of their scores
+        # plus a bonus per distinct method; the rest keep their own score
+        combined = np.bincount(groups, weights=scores * weights)
+        methods = np.bincount(np.unique(groups * len(type_codes) + types) // len(type_codes), minlength=len(unique_ids))
+        combined = np.where(counts > 1, combined + methods * METHOD_BONUS, scores[first_rows])
+        
+        # Best score first, ties in the order the documents were first found
+        order = np.lexsort((first_rows, -combined))[:limit]
         
-        # Merge scores for documents found by multiple methods
         merged_results = []
-        for doc_id, doc_result_list in doc_results.items():
-            if len(doc_result_list) == 1:
-                merged_results.append(doc_result_list[0])
-            else:
-                # Combine scores from different search methods
-                combined_score = 0
-                search_types = []
-                highlights = []
-                
-                for result in doc_result_list:
-                    # Weight different search types
-                    weight = {
-                        'keyword': 0.4,
-                        'semantic': 0.4,
-                        'concept': 0.2
-                    }.get(result['search_type'], 0.3)
-                    
-                    combined_score += result['score'] * weight
-                    search_types.append(result['search_type'])
-                    highlights.extend(result.get('highlights', []))
-                
-                # Bonus for being found by multiple methods
-                method_bonus = len(set(search_types)) * 0.1
-                combined_score += method_bonus
-                
-                merged_results.append({
-                    'document': doc_result_list[0]['document'],
-                    'score': combined_score,
-                    'search_type': 'hybrid',
-                    'search_methods': list(set(search_types)),
-                    'highlights': highlights[:5]  # Limit highlights
-                })
+        for group in order:
+            if counts[group] == 1:
+                merged_results.append(results[first_rows[group]])
+                continue
+            
+            doc_result_list = [results[row] for row in np.flatnonzero(groups == group)]
+            highlights = [highlight for result in doc_result_list for highlight in result.get('highlights', [])]
+            merged_results.append({
+                'document': doc_result_list[0]['document'],
+                'score': float(combined[group]),
+                'search_type': 'hybrid',
+                'search_methods': list(dict.fromkeys(result['search_type'] for result in doc_result_list)),
+                'highlights': highlights[:5]  # Limit highlights
+            })
         
-        return sorted(merged_results, key=lambda x: x['score'], reverse=True)
+        return merged_results
     
-    def _calculate_simple_relevance(self, document, query):
-        """Calculate simple relevance score based on term frequency"""
-        query_terms = query.lower().split()
+    def _calculate_simple_relevance(self, document, query_terms):
+        """Calculate simple relevance score based on term frequency, for lowercased query terms"""
         score = 0
         
         # Check title (higher weight)
@@ -375,7 +687,12 @@ class SearchEngine:
     def _extract_highlights(self, document, query):
         """Extract text highlights around query terms"""
         highlights = []
-        query_terms = [term.lower() for term in query.split()]
+        query_terms = tuple(dict.fromkeys(term.lower() for term in query.split()))
+        if not query_terms:
+            return highlights
+        
+        # One scan per text finds every term
+        pattern = _highlight_pattern(query_terms)
         
         text_sources = [
             ('title', document.title),
@@ -387,77 +704,61 @@ class SearchEngine:
             if not text:
                 continue
             
-            text_lower = text.lower()
-            for term in query_terms:
-                if term in text_lower:
-                    # Find all occurrences
-                    start = 0
-                    while True:
-                        pos = text_lower.find(term, start)
-                        if pos == -1:
-                            break
-                        
-                        # Extract context around the term
-                        context_start = max(0, pos - 50)
-                        context_end = min(len(text), pos + len(term) + 50)
-                        context = text[context_start:context_end]
-                        
-                        # Highlight the term
-                        highlighted = re.sub(
-                            re.escape(term),
-                            f"<mark>{term}</mark>",
-                            context,
-                            flags=re.IGNORECASE
-                        )
-                        
-                        highlights.append({
-                            'source': source_type,
-                            'text': highlighted,
-                            'position': pos
-                        })
-                        
-                        start = pos + 1
-                        
-                        if len(highlights) >= 3:  # Limit highlights
-                            break
-            
-            if len(highlights) >= 3:
-                break
+            for match in pattern.finditer(text):
+                pos = match.start()
+                
+                # Extract context around the term
+                context_start = max(0, pos - 50)
+                context_end = min(len(text), match.end() + 50)
+                context = text[context_start:context_end]
+                
+                highlights.append({
+                    'source': source_type,
+                    'text': pattern.sub(_mark, context),
+                    'position': pos
+                })
+                
+                if len(highlights) >= 3:  # Limit highlights
+                    return highlights
         
-        return highlights[:3]
-    
-    def _extract_semantic_highlights(self, document, query):
-        """Extract semantically relevant highlights"""
-        # For now, use keyword-based highlights
-        # Could be enhanced with more sophisticated semantic matching
-        return self._extract_highlights(document, query)
+        return highlights
     
     def _extract_concept_highlights(self, document, concepts):
         """Extract highlights based on concept matches"""
         highlights = []
         
+        names = {}
         for concept in concepts:
-            if document.content and concept.name.lower() in document.content.lower():
-                pos = document.content.lower().find(concept.name.lower())
-                if pos != -1:
-                    context_start = max(0, pos - 50)
-                    context_end = min(len(document.content), pos + len(concept.name) + 50)
-                    context = document.content[context_start:context_end]
-                    
-                    highlighted = re.sub(
-                        re.escape(concept.name),
-                        f"<mark>{concept.name}</mark>",
-                        context,
-                        flags=re.IGNORECASE
-                    )
-                    
-                    highlights.append({
-                        'source': 'concept',
-                        'text': highlighted,
-                        'concept': concept.name
-                    })
+            if concept.name:
+                names.setdefault(concept.name.lower(), concept.name)
+        if not document.content or not names:
+            return highlights
+        
+        # One scan of the content finds the first occurrence of every concept
+        pattern = _highlight_pattern(tuple(names))
+        found = set()
+        
+        for match in pattern.finditer(document.content):
+            name = names.get(match.group().lower(), match.group())
+            if name in found:
+                continue
+            found.add(name)
+            
+            pos = match.start()
+            context_start = max(0, pos - 50)
+            context_end = min(len(document.content), match.end() + 50)
+            context = document.content[context_start:context_end]
+            
+            highlights.append({
+                'source': 'concept',
+                'text': pattern.sub(_mark, context),
+                'concept': name
+            })
+            
+            if len(highlights) >= 3:
+                break
         
-        return highlights[:3]
+        return highlights
     
     def suggest_query_completions(self, partial_query, limit=10):
         """Suggest query completions based on document content and concepts"""
@@ -466,30 +767,44 @@ class SearchEngine:
         if len(partial_query) < 2:
             return suggestions
         
-        # Get concept suggestions
-        concepts = Concept.query.filter(
-            Concept.name.ilike(f'{partial_query}%')
-        ).order_by(Concept.frequency.desc()).limit(limit).all()
-        
-        for concept in concepts:
-            suggestions.append({
-                'text': concept.name,
-                'type': 'concept',
-                'frequency': concept.frequency
-            })
-        
-        # Get title suggestions
-        documents = Document.query.filter(
-            Document.title.ilike(f'%{partial_query}%'),
+        # Concept and title suggestions come back from one round trip
+        concept_matches = select(
+            literal(0).label('part'),
+            Concept.name.label('text'),
+            Concept.frequency.label('frequency'),
+            null().label('document_id')
+        ).where(
+            concept_prefix_filter(partial_query)
+        ).order_by(Concept.frequency.desc()).limit(limit).subquery()
+        
+        title_matches = select(
+            literal(1).label('part'),
+            Document.title.label('text'),
+            null().label('frequency'),
+            Document.id.label('document_id')
+        ).where(
+            document_title_filter(partial_query),
             Document.processing_status == 'completed'
-        ).limit(5).all()
-        
-        for doc in documents:
-            suggestions.append({
-                'text': doc.title,
-                'type': 'title',
-                'document_id': doc.id
-            })
+        ).limit(5).subquery()
+        
+        matches = union_all(select(concept_matches), select(title_matches)).subquery()
+        rows = db.session.execute(
+            select(matches).order_by(matches.c.part, matches.c.frequency.desc())
+        )
+        
+        for row in rows:
+            if row.part == 0:
+                suggestions.append({
+                    'text': row.text,
+                    'type': 'concept',
+                    'frequency': row.frequency
+                })
+            else:
+                suggestions.append({
+                    'text': row.text,
+                    'type': 'title',
+                    'document_id': row.document_id
+                })
         
         return suggestions[:limit]
     
@@ -506,7 +821,7 @@ class SearchEngine:
             'total_concepts': total_concepts,
             'index_status': {
                 'tfidf_built': self.tfidf_matrix is not None,
-                'embeddings_built': len(self.document_embeddings) > 0,
+                'embeddings_built': self.embedding_matrix is not None and len(self.embedding_doc_ids) > 0,
                 'documents_indexed': len(self.doc_ids) if hasattr(self, 'doc_ids') else 0
             },
             'top_concepts': [concept.to_dict() for concept in top_concepts]
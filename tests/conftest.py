@@ -0,0 +1,28 @@
+import pytest
+
+import backend.services.search_engine as search_engine
+from app import create_app
+from backend.models.document import db
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """App on a fresh SQLite database, without the embedding model"""
+    # Uploads, processed files and the saved search index are written to the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.delenv('REDIS_URL', raising=False)
+    monkeypatch.setattr(search_engine, 'load_embedding_model', lambda: (None, 'none'))
+
+    app = create_app()
+    app.config['TESTING'] = True
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
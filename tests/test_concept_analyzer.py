@@ -0,0 +1,14 @@
+import pytest
+
+pytest.importorskip('spacy')
+
+from backend.services.concept_analyzer import CONCEPT_CATEGORIES, ConceptAnalyzer
+
+
+def test_pattern_match_with_unicode_case_fold_variant():
+    # IGNORECASE lets 'ſ' (long s) match 's', which str.lower() leaves alone
+    concepts = ConceptAnalyzer().extract_concepts_from_text('We value uſability a lot.')
+
+    usability = [c for c in concepts if c['name'] == 'usability']
+    assert usability
+    assert usability[0]['category'] == CONCEPT_CATEGORIES['usability']
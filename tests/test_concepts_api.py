@@ -0,0 +1,55 @@
+from sqlalchemy import select
+
+from backend.models.document import Concept, ConceptRelation, Document, db, document_concepts
+
+
+def _add_document(title):
+    document = Document(
+        filename=f'{title}.txt', original_filename=f'{title}.txt', file_type='text/plain',
+        file_size=1, processing_status='completed', title=title, content=title
+    )
+    db.session.add(document)
+    return document
+
+
+def test_merge_concepts(app, client):
+    with app.app_context():
+        # Created in id order: shared partner 1, other partner 2, primary 3, secondary 4, other partner 5
+        for name, frequency in [('shared', 1), ('low', 1), ('primary', 2), ('secondary', 5), ('high', 1)]:
+            db.session.add(Concept(name=name, frequency=frequency))
+        shared_doc, secondary_doc = _add_document('shared'), _add_document('secondary only')
+        db.session.flush()
+        db.session.execute(document_concepts.insert(), [
+            {'document_id': shared_doc.id, 'concept_id': 3, 'relevance_score': 0.9, 'context': 'primary'},
+            {'document_id': shared_doc.id, 'concept_id': 4, 'relevance_score': 0.1, 'context': 'secondary'},
+            {'document_id': secondary_doc.id, 'concept_id': 4, 'relevance_score': 0.5, 'context': 'moved'},
+        ])
+        db.session.add_all([
+            ConceptRelation(concept1_id=3, concept2_id=4, relation_type='related', strength=0.5),  # Becomes a self-loop
+            ConceptRelation(concept1_id=1, concept2_id=3, relation_type='related', strength=0.7),
+            ConceptRelation(concept1_id=1, concept2_id=4, relation_type='related', strength=0.2),  # Duplicates the one above
+            ConceptRelation(concept1_id=2, concept2_id=4, relation_type='related', strength=0.3),
+            ConceptRelation(concept1_id=4, concept2_id=5, relation_type='related', strength=0.4),
+        ])
+        db.session.commit()
+        shared_id, secondary_doc_id = shared_doc.id, secondary_doc.id
+
+    response = client.post('/api/concepts/merge', json={'primary_id': 3, 'secondary_id': 4})
+
+    assert response.status_code == 200
+    assert response.get_json()['merged_concept']['frequency'] == 7
+    with app.app_context():
+        assert db.session.get(Concept, 4) is None
+        links = db.session.execute(
+            select(document_concepts.c.document_id, document_concepts.c.concept_id,
+                   document_concepts.c.relevance_score, document_concepts.c.context)
+            .order_by(document_concepts.c.document_id)
+        ).all()
+        assert [tuple(link) for link in links] == [
+            (shared_id, 3, 0.9, 'primary'),
+            (secondary_doc_id, 3, 0.5, 'moved'),
+        ]
+        relations = db.session.query(
+            ConceptRelation.concept1_id, ConceptRelation.concept2_id, ConceptRelation.strength
+        ).order_by(ConceptRelation.concept1_id, ConceptRelation.concept2_id).all()
+        assert [tuple(relation) for relation in relations] == [(1, 3, 0.7), (2, 3, 0.3), (3, 5, 0.4)]
@@ -0,0 +1,22 @@
+from io import BytesIO
+
+from backend.models.document import Document, db
+
+
+def test_upload_invalidates_cached_stats(app, client):
+    assert client.get('/api/documents/stats').get_json()['total_documents'] == 0
+
+    # A change that does not bump the data version keeps being served from the cache
+    with app.app_context():
+        db.session.add(Document(filename='a.txt', original_filename='a.txt', file_type='text/plain', file_size=1))
+        db.session.commit()
+    assert client.get('/api/documents/stats').get_json()['total_documents'] == 0
+
+    response = client.post('/api/documents/upload', data={
+        'file': (BytesIO(b'Usability testing with five users finds most problems.'), 'notes.txt')
+    })
+    assert response.status_code == 201
+
+    stats = client.get('/api/documents/stats').get_json()
+    assert stats['total_documents'] == 2
+    assert stats['completed_documents'] == 1
@@ -0,0 +1,57 @@
+from datetime import datetime
+
+from backend.models.document import Concept, Document, db
+
+
+def _fetch_all(client, url, key):
+    """Follow next_cursor through every page; returns the ids and the number of pages"""
+    ids, cursor, pages = [], None, 0
+    while True:
+        response = client.get(url + (f'&cursor={cursor}' if cursor else ''))
+        assert response.status_code == 200
+        data = response.get_json()
+        ids += [item['id'] for item in data[key]]
+        pages += 1
+        cursor = data['next_cursor']
+        if cursor is None:
+            return ids, pages
+
+
+def test_concept_cursor_paging_across_ties(app, client):
+    with app.app_context():
+        # Equal frequencies span the page boundaries, so the id tie-breaker decides the order
+        for i in range(7):
+            db.session.add(Concept(name=f'concept {i}', frequency=2 if i < 5 else 1))
+        db.session.commit()
+
+    ids, pages = _fetch_all(client, '/api/concepts/?sort_by=frequency&per_page=3', 'concepts')
+
+    assert ids == [5, 4, 3, 2, 1, 7, 6]
+    assert pages == 3
+
+
+def test_document_cursor_paging_across_ties(app, client):
+    with app.app_context():
+        for i in range(5):
+            db.session.add(Document(
+                filename=f'{i}.txt', original_filename=f'{i}.txt', file_type='text/plain', file_size=1,
+                upload_date=datetime(2024, 1, 1 + i // 2)
+            ))
+        db.session.commit()
+
+    ids, pages = _fetch_all(client, '/api/documents/?per_page=2', 'documents')
+
+    assert ids == [5, 4, 3, 2, 1]
+    assert pages == 3
+
+
+def test_cursor_from_another_sort_is_rejected(app, client):
+    with app.app_context():
+        for i in range(3):
+            db.session.add(Concept(name=f'concept {i}', frequency=i))
+        db.session.commit()
+    cursor = client.get('/api/concepts/?sort_by=frequency&per_page=1').get_json()['next_cursor']
+
+    for sort_by in ('created_date', 'name'):
+        response = client.get(f'/api/concepts/?sort_by={sort_by}&per_page=1&cursor={cursor}')
+        assert response.status_code == 400
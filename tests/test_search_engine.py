@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+import pytest
+
+from backend.models.document import Document, db
+
+
+def _result(doc_id, score, search_type, highlights=()):
+    return {
+        'document': SimpleNamespace(id=doc_id),
+        'score': score,
+        'search_type': search_type,
+        'highlights': list(highlights)
+    }
+
+
+def test_hybrid_merge_ranking(app):
+    engine = app.extensions['search_engine']
+    results = [
+        _result(1, 0.5, 'keyword', ['k1', 'k2']),
+        _result(2, 0.9, 'keyword'),
+        _result(4, 0.9, 'keyword'),
+        _result(1, 0.8, 'semantic', ['s1', 's2']),
+        _result(3, 0.6, 'semantic'),
+        _result(1, 1.0, 'concept', ['c1', 'c2']),
+        _result(3, 0.2, 'concept'),
+    ]
+
+    merged = engine._merge_search_results(results, 'hybrid')
+
+    # Documents found by several methods score the weighted sum plus 0.1 per method;
+    # equal scores keep the order in which the documents were first found
+    assert [result['document'].id for result in merged] == [1, 2, 4, 3]
+    assert [result['score'] for result in merged] == pytest.approx([1.02, 0.9, 0.9, 0.48])
+    assert merged[0]['search_type'] == 'hybrid'
+    assert merged[0]['search_methods'] == ['keyword', 'semantic', 'concept']
+    assert merged[0]['highlights'] == ['k1', 'k2', 's1', 's2', 'c1']
+    assert merged[1] is results[1]
+    assert merged[3]['search_methods'] == ['semantic', 'concept']
+
+    assert [result['document'].id for result in engine._merge_search_results(results, 'hybrid', limit=2)] == [1, 2]
+    assert engine._merge_search_results(results, 'keyword') is results
+
+
+def test_keyword_search_text_filter(app, client):
+    with app.app_context():
+        for title, content in [
+            ('Usability report', 'Usability testing with five users.'),
+            ('Cognitive load', 'A study of working memory in UX writing.'),
+            ('Quotes', 'The "dark pattern" debate.'),
+        ]:
+            db.session.add(Document(
+                filename=f'{title}.txt', original_filename=f'{title}.txt', file_type='text/plain', file_size=1,
+                processing_status='completed', title=title, content=content, summary=content
+            ))
+        db.session.commit()
+
+    def titles(query):
+        response = client.get('/api/search/', query_string={'q': query, 'type': 'keyword'})
+        assert response.status_code == 200
+        return sorted(result['document']['title'] for result in response.get_json()['results'])
+
+    # Terms of three or more characters go through the trigram index, shorter ones through ILIKE
+    assert titles('USABIL') == ['Usability report']
+    assert titles('usability users') == ['Usability report']
+    assert titles('ux') == ['Cognitive load']
+    assert titles('"dark') == ['Quotes']
+    assert titles('usability memory') == []